@@ -1,6 +1,164 @@
 import array as arr
 import os 
 import json
+import hashlib
+import threading
+from types import MappingProxyType
+
+from .coordinate_engine import plate_grid, render_moves
+
+BOX_POSITION_FILE = "calibration/Machine_Code/box_position.json"
+
+DEFAULT_BOX_POSITIONS = {
+    "Plasticus_Tip_Box":{
+        "plasticus_A1_X_val": 3.8,
+        "plasticus_A12_X_val": 102.7,
+        "plasticus_H1_X_val": 3.4,
+        "plasticus_H12_X_val": 103.1,
+
+        "plasticus_A1_Y_val": 14.5,
+        "plasticus_A12_Y_val": 14.5,
+        "plasticus_H1_Y_val": 77.7,
+        "plasticus_H12_Y_val": 78.2,
+
+        "plasticus_m_val":8,
+        "plasticus_n_val":12
+    },
+
+    "Plasticus_well_Plate_one": {
+        "plasticus_well_A1_X_val": 149.2,
+        "plasticus_well_A12_X_val":  247.5,
+        "plasticus_well_H1_X_val": 148.5,
+        "plasticus_well_H12_X_val":  247.5,
+
+        "plasticus_well_A1_Y_val": 15.4,
+        "plasticus_well_A12_Y_val":  16.4,
+        "plasticus_well_H1_Y_val": 78.9,
+        "plasticus_well_H12_Y_val":  79.6,
+
+        "plasticus_well_m_val":8,
+        "plasticus_well_n_val":12
+    },
+
+    "Plasticus_well_Plate_two": {
+        "plasticus_well_A1_X_val": 145.0,
+        "plasticus_well_A12_X_val":  244.3,
+        "plasticus_well_H1_X_val": 145.3,
+        "plasticus_well_H12_X_val":  244.1,
+
+        "plasticus_well_A1_Y_val": 122.7,
+        "plasticus_well_A12_Y_val":  122.7,
+        "plasticus_well_H1_Y_val": 185.7,
+        "plasticus_well_H12_Y_val":  185.7,
+
+        "plasticus_well_m_val":8,
+        "plasticus_well_n_val":12
+    },
+
+    "Ejection_Box" : {
+        "x": 354.3,
+        "y": 97.7
+    },
+
+    "Reagent_Box":{
+        "First_Reagent_Box_X": 14.3,
+        "First_Reagent_Box_Y": 167.7,
+
+        "Second_Reagent_Box_X": 44.3,
+        "Second_Reagent_Box_Y": 167.7,
+
+        "Third_Reagent_Box_X": 74.3,
+        "Third_Reagent_Box_Y": 167.7,
+
+        "Fourth_Reagent_Box_X": 104.3,
+        "Fourth_Reagent_Box_Y": 167.7
+    }
+}
+
+
+def box_grid(box, labware_format=None):
+    # (rows, cols, 2) grid from the four measured corners of one box_position.json entry
+    prefix = "plasticus_well_" if "plasticus_well_A1_X_val" in box else "plasticus_"
+
+    def corner(name):
+        return (box[f"{prefix}{name}_X_val"], box[f"{prefix}{name}_Y_val"])
+
+    rows, cols = labware_format or (box[f"{prefix}m_val"], box[f"{prefix}n_val"])
+    return plate_grid(corner("A1"), corner("A12"), corner("H1"), corner("H12"), rows, cols)
+
+
+class CoordinateCache():
+    """Process wide box_position.json tables, rebuilt only when the file changes."""
+
+    def __init__(self, file_path=BOX_POSITION_FILE, default=DEFAULT_BOX_POSITIONS):
+        self.file_path = file_path
+        self.default = default
+        self.lock = threading.Lock()
+        self.stamp = None
+        self.digest = None
+        self.data = None
+        self.tables = {}
+
+    def invalidate(self):
+        with self.lock:
+            self.stamp = None
+            self.digest = None
+            self.data = None
+            self.tables = {}
+
+    def _refresh(self):
+        # A stat per call; the file is only re-read when mtime/size moved,
+        # and the tables only dropped when the content really changed.
+        try:
+            info = os.stat(self.file_path)
+            stamp = (info.st_mtime_ns, info.st_size)
+        except OSError:
+            stamp = None
+        if self.data is not None and stamp == self.stamp:
+            return
+
+        if stamp is None:
+            raw = json.dumps(self.default, sort_keys=True).encode()
+        else:
+            with open(self.file_path, "rb") as f:
+                raw = f.read()
+        digest = hashlib.sha1(raw).hexdigest()
+        self.stamp = stamp
+        if self.data is not None and digest == self.digest:
+            return
+
+        data = json.loads(raw)
+        self.digest = digest
+        self.data = MappingProxyType({name: MappingProxyType(dict(values)) for name, values in data.items()})
+        self.tables = {}
+
+    def get_data(self):
+        with self.lock:
+            self._refresh()
+            return self.data
+
+    def get_grid(self, box_name, labware_format=None):
+        with self.lock:
+            self._refresh()
+            key = ("grid", box_name, labware_format)
+            if key not in self.tables:
+                grid = box_grid(self.data[box_name], labware_format)
+                grid.setflags(write=False)
+                self.tables[key] = grid
+            return self.tables[key]
+
+    def get_moves(self, box_name, labware_format=None):
+        # Row-major tuple of "G0X..Y..;" strings
+        grid = self.get_grid(box_name, labware_format)
+        with self.lock:
+            key = ("moves", box_name, labware_format)
+            if key not in self.tables:
+                self.tables[key] = tuple(render_moves(grid))
+            return self.tables[key]
+
+
+coordinate_cache = CoordinateCache()
+
 
 class CoordinateConversion():
 
@@ -10,113 +168,26 @@ class CoordinateConversion():
         self.plasticus_Well_Plate_1_coordinate_list = []
         self.plasticus_Well_Plate_2_coordinate_list = []
 
-        file_path = "calibration/Machine_Code/box_position.json"
-        # Load existing data or create default structure
-        if os.path.exists(file_path):
-            with open(file_path, "r") as f:
-                data = json.load(f)
-        else:
-            data = {
-                        "Plasticus_Tip_Box":{
-                        "plasticus_A1_X_val": 3.8,
-                        "plasticus_A12_X_val": 102.7,
-                        "plasticus_H1_X_val": 3.4,
-                        "plasticus_H12_X_val": 103.1,
-
-                        "plasticus_A1_Y_val": 14.5,
-                        "plasticus_A12_Y_val": 14.5,
-                        "plasticus_H1_Y_val": 77.7,
-                        "plasticus_H12_Y_val": 78.2,
-
-                        "plasticus_m_val":8,
-                        "plasticus_n_val":12
-                    },
-
-                    
-                    "Plasticus_well_Plate_one": {
-                        "plasticus_well_A1_X_val": 149.2,
-                        "plasticus_well_A12_X_val":  247.5,
-                        "plasticus_well_H1_X_val": 148.5,
-                        "plasticus_well_H12_X_val":  247.5,
-
-                        "plasticus_well_A1_Y_val": 15.4,
-                        "plasticus_well_A12_Y_val":  16.4,
-                        "plasticus_well_H1_Y_val": 78.9,
-                        "plasticus_well_H12_Y_val":  79.6,
-
-                        "plasticus_well_m_val":8,
-                        "plasticus_well_n_val":12
-                    },
-
-                    "Plasticus_well_Plate_two": {
-                        "plasticus_well_A1_X_val": 145.0,
-                        "plasticus_well_A12_X_val":  244.3,
-                        "plasticus_well_H1_X_val": 145.3,
-                        "plasticus_well_H12_X_val":  244.1,
-
-                        "plasticus_well_A1_Y_val": 122.7,
-                        "plasticus_well_A12_Y_val":  122.7,
-                        "plasticus_well_H1_Y_val": 185.7,
-                        "plasticus_well_H12_Y_val":  185.7,
-
-                        "plasticus_well_m_val":8,
-                        "plasticus_well_n_val":12
-                    },
-
-                    "Ejection_Box" : {
-                        "x": 354.3,
-                        "y": 97.7
-                    },
-
-                    "Reagent_Box":{
-                        "First_Reagent_Box_X": 14.3,
-                        "First_Reagent_Box_Y": 167.7,
-                        
-                        "Second_Reagent_Box_X": 44.3,
-                        "Second_Reagent_Box_Y": 167.7,
-                        
-                        "Third_Reagent_Box_X": 74.3,
-                        "Third_Reagent_Box_Y": 167.7,
-                        
-                        "Fourth_Reagent_Box_X": 104.3,
-                        "Fourth_Reagent_Box_Y": 167.7
-                    }
-
-
-                }
-
-        self.data = data
+        # Shared, read-only copy of box_position.json (see CoordinateCache)
+        self.data = coordinate_cache.get_data()
 
     def Co_ordinate_Horizontal_Calc(self, A1_X_Val, A1_Y_Val, A12_X_Val, A12_Y_Val, H1_X_Val, H1_Y_Val, m_val, n_val):
-        x_offset = ((A12_X_Val - A1_X_Val) / (n_val -1))
-        y_offset = ((H1_Y_Val - A1_Y_Val) / (m_val - 1))
-        delta_x =  ((H1_X_Val - A1_X_Val) / (m_val -1))
-        delta_y = ((A12_Y_Val - A1_Y_Val) / (n_val - 1))
-
-        plasticus_box = [["" for _ in range(n_val)] for _ in range(m_val)]
-        # print(f"delta_x  = {delta_x}, x_offset = {x_offset}, delta_y = {delta_y}, y_offset = {y_offset}")
-
-        for m in range (m_val):
-            for n in range (n_val):
-                pos_x = abs(round((A1_X_Val + ((n) * x_offset) + ((m) * delta_x)), 2))
-                pos_y = abs(round((A1_Y_Val + (m) * y_offset + (n) * delta_y), 2))
-                plasticus_box[m][n] = f"G0X{pos_x}Y{pos_y};"
-        return plasticus_box
+        # Three corner version, H12 is taken as the parallelogram corner
+        H12 = (A12_X_Val + H1_X_Val - A1_X_Val, A12_Y_Val + H1_Y_Val - A1_Y_Val)
+        grid = plate_grid((A1_X_Val, A1_Y_Val), (A12_X_Val, A12_Y_Val), (H1_X_Val, H1_Y_Val), H12, m_val, n_val)
+        moves = render_moves(grid)
+        return [moves[m * n_val:(m + 1) * n_val] for m in range(m_val)]
+
+    def get_Labware_Grid(self, box_name, labware_format=None):
+        # (rows, cols, 2) read-only float array from the four measured corners of a box.
+        # labware_format = (rows, cols), e.g. coordinate_engine.labware_format(384)
+        return coordinate_cache.get_grid(box_name, labware_format)
     
 
     # ============================= Function For Tip Box ============================================
 
     def Tip_Single_Pos_Calculation(self, m, n):
-        x_offset = (self.data["Plasticus_Tip_Box"]["plasticus_A12_X_val"] - self.data["Plasticus_Tip_Box"]["plasticus_A1_X_val"]) / (self.data["Plasticus_Tip_Box"]["plasticus_n_val"] - 1)
-        y_offset = (self.data["Plasticus_Tip_Box"]["plasticus_H1_Y_val"] - self.data["Plasticus_Tip_Box"]["plasticus_A1_Y_val"]) / (self.data["Plasticus_Tip_Box"]["plasticus_m_val"] -1)
-        delta_x = (self.data["Plasticus_Tip_Box"]["plasticus_H1_X_val"] - self.data["Plasticus_Tip_Box"]["plasticus_A1_X_val"]) / (self.data["Plasticus_Tip_Box"]["plasticus_m_val"] -1)
-        delta_y = (self.data["Plasticus_Tip_Box"]["plasticus_A12_Y_val"] - self.data["Plasticus_Tip_Box"]["plasticus_A1_Y_val"]) / (self.data["Plasticus_Tip_Box"]["plasticus_n_val"] - 1)
-       
-        # print(f"delta_x  = {delta_x}, x_offset = {x_offset}, delta_y = {delta_y}, y_offset = {y_offset}")
-
-        pos_x = abs(round((self.data["Plasticus_Tip_Box"]["plasticus_A1_X_val"] + ((n-1) * x_offset) + ((m-1) * delta_x)), 2))
-        pos_y = abs(round((self.data["Plasticus_Tip_Box"]["plasticus_A1_Y_val"] + (m-1) * y_offset + (n-1) * delta_y), 2))
-        return f"G0X{pos_x}Y{pos_y};"
+        return render_moves(self.get_Labware_Grid("Plasticus_Tip_Box")[m-1, n-1])[0]
  
     def show_values(self):
         # ================= For Tip Box ===================
@@ -134,30 +205,15 @@ class CoordinateConversion():
                 print(f"({i+1}, {j+1}) = {val}")
 
     def get_Plasticus_Tip_Box_List(self):
-        co_ordinates = self.Co_ordinate_Horizontal_Calc(self.data["Plasticus_Tip_Box"]["plasticus_A1_X_val"], self.data["Plasticus_Tip_Box"]["plasticus_A1_Y_val"], 
-                                             self.data["Plasticus_Tip_Box"]["plasticus_A12_X_val"], self.data["Plasticus_Tip_Box"]["plasticus_A12_Y_val"], self.data["Plasticus_Tip_Box"]["plasticus_H1_X_val"], 
-                                             self.data["Plasticus_Tip_Box"]["plasticus_H1_Y_val"], self.data["Plasticus_Tip_Box"]["plasticus_m_val"], self.data["Plasticus_Tip_Box"]["plasticus_n_val"])
-        for i, row in enumerate (co_ordinates):
-            for j, val in enumerate (row):
-                self.plasticus_Tip_Box_coordinate_list.append(val)
+        self.plasticus_Tip_Box_coordinate_list = coordinate_cache.get_moves("Plasticus_Tip_Box")
         return self.plasticus_Tip_Box_coordinate_list
     
     def get_Plasticus_One_Well_Plate_List(self):
-        co_ordinates = self.Co_ordinate_Horizontal_Calc(self.data["Plasticus_well_Plate_one"]["plasticus_well_A1_X_val"], self.data["Plasticus_well_Plate_one"]["plasticus_well_A1_Y_val"], 
-                                             self.data["Plasticus_well_Plate_one"]["plasticus_well_A12_X_val"], self.data["Plasticus_well_Plate_one"]["plasticus_well_A12_Y_val"], self.data["Plasticus_well_Plate_one"]["plasticus_well_H1_X_val"], 
-                                             self.data["Plasticus_well_Plate_one"]["plasticus_well_H1_Y_val"], self.data["Plasticus_well_Plate_one"]["plasticus_well_m_val"], self.data["Plasticus_well_Plate_one"]["plasticus_well_n_val"])
-        for i, row in enumerate (co_ordinates):
-            for j, val in enumerate (row):
-                self.plasticus_Well_Plate_1_coordinate_list.append(val)
+        self.plasticus_Well_Plate_1_coordinate_list = coordinate_cache.get_moves("Plasticus_well_Plate_one")
         return self.plasticus_Well_Plate_1_coordinate_list
     
     def get_Plasticus_Two_Well_Plate_List(self):
-        co_ordinates = self.Co_ordinate_Horizontal_Calc(self.data["Plasticus_well_Plate_two"]["plasticus_well_A1_X_val"], self.data["Plasticus_well_Plate_two"]["plasticus_well_A1_Y_val"], 
-                                             self.data["Plasticus_well_Plate_two"]["plasticus_well_A12_X_val"], self.data["Plasticus_well_Plate_two"]["plasticus_well_A12_Y_val"], self.data["Plasticus_well_Plate_two"]["plasticus_well_H1_X_val"], 
-                                             self.data["Plasticus_well_Plate_two"]["plasticus_well_H1_Y_val"], self.data["Plasticus_well_Plate_two"]["plasticus_well_m_val"], self.data["Plasticus_well_Plate_two"]["plasticus_well_n_val"])
-        for i, row in enumerate (co_ordinates):
-            for j, val in enumerate (row):
-                self.plasticus_Well_Plate_2_coordinate_list.append(val)
+        self.plasticus_Well_Plate_2_coordinate_list = coordinate_cache.get_moves("Plasticus_well_Plate_two")
         return self.plasticus_Well_Plate_2_coordinate_list
     
     def get_Ejection_Area(self):
@@ -1,77 +1,779 @@
-import sys
 import serial
 import time
 import threading
 import json
 import os
-import queue
+import zlib
+import itertools
+import selectors
+from collections import deque
 
 #  Detection
 from .box_detection_thread import BoxDetectionThread 
 
 # Co-ordinate Function
-from .Co_ordinate_Conversion_version2 import CoordinateConversion
+from .Co_ordinate_Conversion_version2 import CoordinateConversion, coordinate_cache, BOX_POSITION_FILE
+
+# Run time estimation
+from .run_time_estimator import RunTimeEstimator
+
+# G-code clean up before sending
+from .gcode_optimizer import GcodeOptimizer, SAFE_Z
+
+# Well visit ordering
+from .well_route_planner import WellRoutePlanner, xy_from_gcode
+
+# Serial reader thread and typed responses
+from .serial_transport import SerialTransport, OK, ERROR, POSITION
+
+# Commands parsed / encoded once and shared
+from .gcode_command import gcode_command, gcode_commands
+
+# Queue lanes, lower number always goes first
+from .command_lanes import INTERACTIVE, BULK, LANES
+
+# Per batch completion handle
+from .batch_handle import BatchHandle, OK as BATCH_OK, ERROR as BATCH_ERROR, CANCELLED, ABORTED
+
+# Background port scan / handshake / reconnect
+from .connection_manager import SerialConnectionManager, CONNECTING
+
+# What the controller holds for C1-C6
+from .firmware_config import FirmwareConfigShadow, config_commands
+
+# Per-command latency histograms
+from .pipeline_metrics import PipelineMetrics
+
+# Acked-command journal for resuming interrupted runs
+from .run_journal import RunJournal, read_journal
+
+# Compiled procedures cached on disk
+from .protocol_artifact import artifact_key, load_artifact, recording_stream
+
+# Replaying .gcode files / artifacts
+from .gcode_replay import open_replay, replay_progress
 
 # QT Threads, Timer, and Signal
-from PyQt5.QtCore import Qt, pyqtSignal, QThread, QTimer
+from PyQt5.QtCore import pyqtSignal, QThread
+
+# Commands allowed in flight before an OK; is needed. The byte limit keeps us
+# inside the Arduino's 64 byte serial RX buffer.
+STREAM_WINDOW = 4
+STREAM_WINDOW_BYTES = 60
+
+# Point this at a firmware_simulator pty to run without the Arduino
+SERIAL_PORT = os.environ.get("LHS_SERIAL_PORT", "/dev/ttyUSB0")
+
+# LHS_PIPELINE_METRICS=0 turns the per-command instrumentation off entirely,
+# LHS_SERIAL_VERBOSE=0 drops the print / log line per command and response
+PIPELINE_METRICS = os.environ.get("LHS_PIPELINE_METRICS", "1") != "0"
+SERIAL_VERBOSE = os.environ.get("LHS_SERIAL_VERBOSE", "1") != "0"
+METRICS_DUMP = "calibration/Machine_Code/pipeline_metrics.json"
+
+# replace key for jog moves
+JOG = "jog"
+
+# Everything a compiled procedure depends on; any change here means recompiling
+MODULE_DIR = os.path.dirname(os.path.abspath(__file__))
+PROTOCOL_FILES = (
+    os.path.join(MODULE_DIR, "Machine_Backend_V2.py"),
+    os.path.join(MODULE_DIR, "gcode_optimizer.py"),
+    os.path.join(MODULE_DIR, "well_route_planner.py"),
+    os.path.join(MODULE_DIR, "Co_ordinate_Conversion_version2.py"),
+    os.path.join(MODULE_DIR, "coordinate_engine.py"),
+    os.path.join(MODULE_DIR, "gcode_command.py"),
+    BOX_POSITION_FILE,
+    "calibration/Machine_Code/start_up_values.json",
+)
+
+# Generator procedures start_procedure() runs by name
+PROCEDURES = ("serial_Dilution", "check_Tip_Box", "check_Well_Plate")
+
+# Procedures resume_interrupted_run() may start again by name (an E0 per tip cycle)
+RESUMABLE_PROCEDURES = ("serial_Dilution", "check_Tip_Box")
+
+# Out-of-band feed hold, written straight to the port by abort() when the
+# controller answered the probe at connect (connection_manager.probe_feed_hold).
+# It stops, drops what it has buffered and answers with a position report only.
+HALT = b"!"
+HALT_REPORT_TIMEOUT = 0.5  # seconds to wait for that report before giving up on it
+# Without feed hold the commands already sent still run; seconds to wait for
+# each of their answers before the position is given up as unknown
+ABORT_DRAIN_TIMEOUT = 15.0
 
 
 class CommandQueueWorker(QThread):
     log_signal = pyqtSignal(str)
-    finished_batch_signal = pyqtSignal(object)
+    finished_batch_signal = pyqtSignal(object)  # BatchHandle, from the worker thread
+    busy_changed = pyqtSignal(bool)  # True when work starts, False when the queue drains
+    link_lost = pyqtSignal(str)  # the serial port stopped working, reason
+    aborted = pyqtSignal(dict)  # last_abort, once the worker is idle again
 
-    def __init__(self, arduino, parent=None):
+    def __init__(self, arduino, parent=None, window=1, window_bytes=None, feed_hold=False):
         super().__init__(parent)
         self.arduino = arduino
-        self.command_queue = queue.Queue()
+        self.lanes = {lane: deque() for lane in LANES}  # ([GcodeCommand], BatchHandle)
+        self.active = []  # handles taken from the lanes, outer first while preempted
+        self.lane_lock = threading.Lock()
+        self.position = {axis: None for axis in "XYZA"}  # last commanded, None = unknown
         self.stop_event = threading.Event()
+        self.resume_event = threading.Event()  # cleared while paused
+        self.resume_event.set()
         self.running = True
-
-    def enqueue(self, command_list, callback=None):
-        self.command_queue.put((command_list, callback))
+        self.busy = False
+
+        # Streaming: up to `window` commands (and `window_bytes` bytes) may be
+        # sent before their OK; comes back. window=1 is plain send -> OK -> send.
+        self.window = max(1, int(window))
+        self.window_bytes = window_bytes
+        self.in_flight = deque()  # [command, size, sent_at, batch]
+        self.in_flight_bytes = 0
+        self.reset_pipeline_stats()
+        self.verbose = SERIAL_VERBOSE
+        self.metrics = PipelineMetrics() if PIPELINE_METRICS else None
+
+        # The thread sleeps in one select() on a wake-up pipe; enqueue / stop /
+        # resume and the transport's reader thread write a byte to it.
+        self.selector = selectors.DefaultSelector()
+        self._wake_r, self._wake_w = os.pipe()
+        os.set_blocking(self._wake_r, False)
+        os.set_blocking(self._wake_w, False)
+        self.selector.register(self._wake_r, selectors.EVENT_READ, "wake")
+        # arduino may be None until the connection manager has a port (set_port);
+        # queued batches wait until then.
+        self.transport = None
+        self._next_port = arduino
+        self._next_feed_hold = feed_hold
+        self.feed_hold = False  # the controller stops on HALT, probed per connect
+        self._link_reported = False
+        self.abort_requested_at = None
+        self.abort_reason = "stop"
+        self.interrupted = None  # oldest in-flight command when work was abandoned
+        self.last_abort = None  # what the last abort() cut off, where the head stopped
+
+    def enqueue(self, command_list, callback=None, lane=BULK, replace=None, total=None, journal_factory=None):
+        # Returns the batch's BatchHandle. callback() runs on the GUI thread once
+        # the batch has run to its end (not when cancelled / aborted).
+        # Lists are converted now; any other iterable (a procedure generator) is
+        # read lazily by the worker, one command per free pipeline slot.
+        # With `replace`, a batch with the same key that has not started yet is
+        # swapped for this one (jogs: only the newest target matters).
+        # `total` is the expected length of a lazy batch, for progress.
+        # `journal_factory()` returns a started RunJournal (or None) that records
+        # every ack; it is called when the batch starts, so a run queued behind
+        # another never touches the journal file the running one is writing.
+        if isinstance(command_list, (list, tuple)):
+            command_list = gcode_commands(command_list)
+            handle = BatchHandle(len(command_list), lane)
+        else:
+            command_list = map(gcode_command, command_list)
+            handle = BatchHandle(total, lane)
+        handle.replace_key = replace
+        handle.journal_factory = journal_factory
+        if callback:
+            handle.add_done_callback(lambda h: callback() if h.status not in (CANCELLED, ABORTED) else None)
+        replaced = None
+        with self.lane_lock:
+            queue = self.lanes[lane]
+            if replace is not None:
+                for index, (_, queued) in enumerate(queue):
+                    if queued.replace_key == replace:
+                        replaced = queued
+                        queue[index] = (command_list, handle)
+                        break
+            if replaced is None:
+                queue.append((command_list, handle))
+        if replaced is not None:
+            self._finish_unstarted(replaced, CANCELLED)
+        self._wakeup()
+        return handle
+
+    def cancel_pending(self, key):
+        # Drops not yet started batches enqueued with replace=key, returns how many
+        dropped = []
+        with self.lane_lock:
+            for lane in LANES:
+                kept = deque()
+                for item in self.lanes[lane]:
+                    if item[1].replace_key == key:
+                        dropped.append(item[1])
+                    else:
+                        kept.append(item)
+                self.lanes[lane] = kept
+        for handle in dropped:
+            self._finish_unstarted(handle, CANCELLED)
+        return len(dropped)
+
+    def _finish_unstarted(self, handle, status):
+        # A batch that never reached the worker loop (and has no journal yet)
+        handle._finish(status)
+
+    def _close_journal(self, handle, status):
+        # Before the handle completes, so whoever it wakes finds the journal final
+        if handle.journal is not None:
+            handle.journal.finish(BATCH_ERROR if status == BATCH_OK and handle.errors else status)
+
+    def _take(self, above=None):
+        # Next (lane, command_list, handle), highest priority first. With `above`
+        # only lanes more urgent than it are looked at.
+        with self.lane_lock:
+            for lane in LANES:
+                if above is not None and lane >= above:
+                    break
+                if self.lanes[lane]:
+                    command_list, handle = self.lanes[lane].popleft()
+                    self.active.append(handle)  # until _run_batch is done with it
+                    return lane, command_list, handle
+        return None
+
+    def _has_waiting(self, above):
+        return any(self.lanes[lane] for lane in LANES if lane < above)
     
     def stop(self):
+        # Stops sending; the worker flushes what is in flight and goes idle again
         self.stop_event.set()
+        self.resume_event.set()
+        self._wakeup()
+
+    def abort(self, reason="stop", only_key=None):
+        # Stops as fast as the controller allows, callable from any thread.
+        # With feed hold the halt goes out before anything still queued and the
+        # head stops mid-move; without it the commands already sent run to their
+        # end. Either way waiting batches are cancelled, the running one is
+        # aborted (handle.interrupted_at) and nothing new is sent. Returns how
+        # many were cancelled. Under lane_lock the worker can neither take a
+        # batch nor send a command, so nothing slips out behind the halt.
+        # With only_key nothing happens (None) unless every batch running or
+        # waiting was enqueued with replace=only_key: a jog release never cuts
+        # off a protocol.
+        with self.lane_lock:
+            if only_key is not None and not self._only_batches(only_key):
+                return None
+            self.abort_requested_at = time.monotonic()
+            self.abort_reason = reason
+            self.interrupted = None
+            self.stop_event.set()
+            waiting = [handle for lane in LANES for _, handle in self.lanes[lane]]
+            for lane in LANES:
+                self.lanes[lane].clear()
+            transport = self.transport
+            if self.feed_hold and transport is not None and transport.alive:
+                try:
+                    transport.write(HALT)
+                except (serial.SerialException, OSError) as e:
+                    print(f"[QueueWorker] Halt not sent: {e}")
+        self.stop()
+        for handle in waiting:
+            self._finish_unstarted(handle, CANCELLED)
+        how = "halt sent" if self.feed_hold else "no feed hold, sent commands run to their end"
+        print(f"[QueueWorker] Abort ({reason}): {how}, {len(waiting)} waiting batches cancelled")
+        return len(waiting)
+
+    def _only_batches(self, key):
+        # Under lane_lock: something is running or waiting, all of it replace=key.
+        # Worker-made moves (lift / restore) have no handle and count as other work.
+        handles = [handle for lane in LANES for _, handle in self.lanes[lane]]
+        handles += list(self.active)
+        handles += [item[3]["handle"] for item in list(self.in_flight)]
+        return bool(handles) and all(handle is not None and handle.replace_key == key for handle in handles)
+
+    def set_port(self, arduino, feed_hold=False):
+        # New (or reconnected) serial port, picked up by the worker thread
+        with self.lane_lock:
+            self._next_port = arduino
+            self._next_feed_hold = feed_hold
+        self._wakeup()
+
+    def _attach_port(self):
+        with self.lane_lock:
+            arduino, self._next_port = self._next_port, None
+            self.feed_hold = self._next_feed_hold
+        if self.transport is not None:
+            self.transport.close()
+        if self.arduino is not None and self.arduino is not arduino:
+            try:
+                self.arduino.close()
+            except Exception:
+                pass
+        self._abandon_in_flight()
+        self.arduino = arduino
+        self.transport = SerialTransport(arduino, on_response=self._wakeup)
+        self.transport.timestamps = self.metrics is not None
+        self.transport.start()
+        self._link_reported = False
+
+    def link_up(self):
+        return self.transport is not None and self.transport.alive
+
+    def shutdown(self):
+        # Ends the thread itself (stop() only abandons the current work)
+        self.running = False
+        self.stop()
+
+    def pause(self):
+        # Stops sending at the next command boundary, in-flight commands still finish
+        self.resume_event.clear()
+
+    def resume(self):
+        self.resume_event.set()
+        self._wakeup()
+
+    @property
+    def paused(self):
+        return not self.resume_event.is_set()
+
+# ============================ Event Wait ===================================
+    def _wakeup(self):
+        try:
+            os.write(self._wake_w, b"\0")
+        except (BlockingIOError, OSError):
+            pass  # pipe already full, the thread is waking anyway
+
+    def _wait_events(self, timeout=None):
+        # Block until a response, new work or a stop/resume arrives
+        for key, _ in self.selector.select(timeout):
+            if key.data == "wake":
+                try:
+                    while os.read(self._wake_r, 512):
+                        pass
+                except BlockingIOError:
+                    pass
+
+    def _set_busy(self, busy):
+        if busy != self.busy:
+            self.busy = busy
+            self.busy_changed.emit(busy)
+
+# ============================ Pipeline Stats ===================================
+    def reset_pipeline_stats(self):
+        self.stats = {
+            "sent": 0,
+            "acked": 0,
+            "errors": 0,
+            "max_depth": 0,
+            "depth_total": 0,
+            "wait_total": 0.0,
+            "max_wait": 0.0,
+            "last_wait": 0.0,
+        }
+
+    def get_pipeline_stats(self):
+        sent = self.stats["sent"]
+        acked = self.stats["acked"]
+        return {
+            "window": self.window,
+            "window_bytes": self.window_bytes,
+            "sent": sent,
+            "acked": acked,
+            "errors": self.stats["errors"],
+            "in_flight": len(self.in_flight),
+            "max_depth": self.stats["max_depth"],
+            "avg_depth": round(self.stats["depth_total"] / sent, 2) if sent else 0.0,
+            "avg_wait_ms": round(self.stats["wait_total"] * 1000 / acked, 2) if acked else 0.0,
+            "max_wait_ms": round(self.stats["max_wait"] * 1000, 2),
+            "last_wait_ms": round(self.stats["last_wait"] * 1000, 2),
+        }
+
+# ============================ Instrumentation ===================================
+    # self.metrics can go None from another thread at any time: every user reads
+    # it into a local once and works with that
+    def set_metrics_enabled(self, enabled):
+        # Off: no timestamps, no histograms, nothing but a None check per command
+        metrics = self.metrics
+        if enabled and metrics is None:
+            self.metrics = PipelineMetrics()
+        elif not enabled:
+            self.metrics = None
+        if self.transport is not None:
+            self.transport.timestamps = bool(enabled)
+
+    def metrics_snapshot(self, metrics=None):
+        # metrics: the PipelineMetrics the caller already read, else self.metrics
+        if metrics is None:
+            metrics = self.metrics
+        if metrics is None:
+            return None
+        waiting = {lane: len(self.lanes[lane]) for lane in LANES}
+        return metrics.snapshot(in_flight=len(self.in_flight), waiting=waiting)
+
+# ============================ Credit Handling ==================================
+    def _has_credit(self, size):
+        if not self.in_flight:
+            return True
+        if len(self.in_flight) >= self.window:
+            return False
+        if self.window_bytes is not None and self.in_flight_bytes + size > self.window_bytes:
+            return False
+        return True
+
+    def _send(self, command, batch, ready_at=None):
+        # command is a GcodeCommand, its bytes are written as they are.
+        # ready_at: when it could have gone out, for the queue-wait histogram
+        with self.lane_lock:
+            if self.stop_event.is_set():
+                return  # abort() got in first, the caller stops at its next check
+            self.transport.write(command.data)
+        sent_at = time.monotonic()
+
+        self._track_position(command)
+        self.in_flight.append([command, len(command.data), sent_at, batch, ready_at])
+        self.in_flight_bytes += len(command.data)
+        batch["pending"] += 1
+        if batch["handle"]:
+            batch["handle"]._command_sent()
+
+        depth = len(self.in_flight)
+        self.stats["sent"] += 1
+        self.stats["depth_total"] += depth
+        self.stats["max_depth"] = max(self.stats["max_depth"], depth)
+        metrics = self.metrics
+        if metrics is not None:
+            metrics.command_sent(depth)
+        if self.verbose:
+            self.log_signal.emit(f"[QueueWorker] Sent: {command.text} (depth {depth})")
+
+    def _track_position(self, command):
+        code = command.code
+        if code == "G0":
+            for axis, value in command.axes:
+                self.position[axis] = value
+        elif code in ("H0", "H1", "H2", "H3"):
+            self.position["XYZA"[int(code[1])]] = 0.0
+        elif code == "E0":
+            self.position["A"] = None
+        elif code[:1] == "C":
+            self.position = {axis: None for axis in "XYZA"}
+
+    def _collect_ack(self, block=True):
+        # Handle responses until the oldest in-flight command is acknowledged
+        # (OK; / ER:1;). Returns False if block=False and no ack was waiting.
+        while self.in_flight and not self.stop_event.is_set():
+            response = self.transport.next_response()
+            if response is None:
+                if not self.transport.alive:
+                    raise RuntimeError(f"Serial reader stopped ({self.transport.error})")
+                if not block:
+                    return False
+                self._wait_events()
+                continue
+            if self.verbose:
+                print(response.text)
+
+            is_error = response.kind == ERROR
+            if response.kind == OK or is_error:
+                command, size, sent_at, batch, ready_at = self.in_flight.popleft()
+                self.in_flight_bytes -= size
+                acked_at = time.monotonic()
+                waited = acked_at - sent_at
+                metrics = self.metrics
+                if metrics is not None:
+                    metrics.command_acked(command, ready_at, sent_at, response.received_at, acked_at, is_error)
+
+                self.stats["acked"] += 1
+                self.stats["wait_total"] += waited
+                self.stats["last_wait"] = waited
+                self.stats["max_wait"] = max(self.stats["max_wait"], waited)
+                if is_error:
+                    self.stats["errors"] += 1
+                if self.verbose:
+                    self.log_signal.emit(f"[QueueWorker] {response.text} for {command.text} after {waited * 1000:.1f} ms")
+
+                batch["pending"] -= 1
+                handle = batch["handle"]
+                if handle:
+                    handle._command_acked(command.text, response.text, is_error)
+                    if handle.journal is not None:
+                        handle.journal.command_acked(handle.acked - 1, command, is_error)
+                if batch["sent_all"] and batch["pending"] == 0:
+                    self._finish_batch(batch)
+                return True
+        return False
+
+    def _abandon_in_flight(self):
+        # Nothing more will be acknowledged for these, release their batches
+        batches = []
+        for _, _, _, batch, _ in self.in_flight:
+            if batch not in batches:
+                batches.append(batch)
+        if self.in_flight:
+            command, _, _, batch, _ = self.in_flight[0]
+            self.interrupted = {"command": command.text, "batch": batch["handle"], "unanswered": len(self.in_flight)}
+        self.in_flight.clear()
+        self.in_flight_bytes = 0
+        for batch in batches:
+            batch["pending"] = 0
+            batch["status"] = ABORTED
+            handle = batch["handle"]
+            if handle is not None and handle.interrupted_at is None:
+                handle.interrupted_at = handle.acked  # acks are in order: the first unanswered one
+            if batch["sent_all"]:
+                self._finish_batch(batch)
+
+    def _finish_batch(self, batch):
+        if batch.get("done"):
+            return
+        batch["done"] = True
+        handle = batch["handle"]
+        if handle is None:
+            return
+        self._close_journal(handle, batch["status"])
+        handle._finish(batch["status"])
+        print("[Worker] Finished Signal emitted")
+        self.finished_batch_signal.emit(handle)
+
+# ============================ Lanes / Preemption ===============================
+    def _preempt(self, lane, restore=True):
+        # Called between two commands of a `lane` batch when something more
+        # urgent is waiting. The tip comes out of the labware first, then the
+        # urgent work runs; with `restore` the head goes back where the
+        # interrupted batch left it before carrying on.
+        paused_at = dict(self.position)
+        print(f"[QueueWorker] Lane {lane} paused for more urgent work.")
+        if self.position["Z"] is not None and self.position["Z"] > SAFE_Z:
+            self._send_unbatched([f"G0Z{SAFE_Z};"])
+        while not self.stop_event.is_set():
+            item = self._take(above=lane)
+            if item is None:
+                break
+            self._run_batch(*item)
+        if restore and not self.stop_event.is_set():
+            self._restore_position(paused_at)
+        print(f"[QueueWorker] Lane {lane} resumed.")
+
+    def _restore_position(self, target):
+        # X, Y and Z only: A is the plunger, moving it back would aspirate or
+        # dispense whatever the tip is in. The next protocol move sets A itself.
+        moved = [axis for axis in "XYZ" if target[axis] is not None and target[axis] != self.position[axis]]
+        if not moved:
+            return
+        commands = []
+        current_z = self.position["Z"]
+        if "X" in moved or "Y" in moved:
+            heights = [z for z in (SAFE_Z, current_z, target["Z"]) if z is not None]
+            if min(heights) != current_z:
+                commands.append(f"G0Z{min(heights)};")
+                current_z = min(heights)
+            xy = "".join(f"{axis}{target[axis]}" for axis in "XY" if target[axis] is not None)
+            commands.append(f"G0{xy};")
+        if target["Z"] is not None and target["Z"] != current_z:
+            commands.append(f"G0Z{target['Z']};")
+        print(f"[QueueWorker] Restoring position: {commands}")
+        self._send_unbatched(commands)
+
+    def _send_unbatched(self, commands):
+        # Worker-made moves (lift / restore), acked like any other but owned by no handle
+        batch = {"handle": None, "pending": 0, "sent_all": False, "status": BATCH_OK}
+        for command in gcode_commands(commands):
+            while not self._has_credit(len(command)) and not self.stop_event.is_set():
+                self._collect_ack()
+            if self.stop_event.is_set():
+                break
+            self._send(command, batch)
+        batch["sent_all"] = True
+        if batch["pending"] == 0:
+            batch["done"] = True
+
+    def _run_batch(self, lane, command_list, handle):
+        batch = {"handle": handle, "pending": 0, "sent_all": False, "status": BATCH_OK}
+        handle._start()
+        if handle.journal_factory is not None:
+            # The run before may still be journaling its last acks, it closes
+            # the file only when they are in
+            while self.in_flight and not self.stop_event.is_set():
+                self._collect_ack()
+            handle.journal = handle.journal_factory()
+        lazy = not isinstance(command_list, list)
+        try:
+            for command in command_list:
+                # Enqueue time per command: lists were all queued at once, lazy
+                # batches hand a command over only when it is pulled
+                ready_at = None
+                metrics = self.metrics
+                if metrics is not None:
+                    ready_at = time.monotonic() if lazy else handle.queued_at
+                if self.stop_event.is_set():
+                    print("[QueueWorker] STOP signal received.")
+                    break
+                if handle.cancel_requested():
+                    print("[QueueWorker] Batch cancelled.")
+                    batch["status"] = CANCELLED
+                    break
+
+                # Strict priority: anything in a more urgent lane goes first
+                if self._has_waiting(lane):
+                    self._preempt(lane)
+
+                # Deck / user pause only holds protocol traffic. Jogs while
+                # paused stay where the user put them; the head goes back once,
+                # on resume.
+                if lane == BULK and not self.resume_event.is_set():
+                    print("[QueueWorker] Paused.")
+                    paused_at = dict(self.position)
+                    moved = False
+                    while not self.resume_event.is_set():
+                        if self._has_waiting(lane):
+                            self._preempt(lane, restore=False)
+                            moved = True
+                        elif not self._collect_ack(block=False):
+                            self._wait_events()
+                    if moved and not self.stop_event.is_set():
+                        self._restore_position(paused_at)
+
+                size = len(command.data)
+                while not self._has_credit(size) and not self.stop_event.is_set():
+                    self._collect_ack()
+                if self.stop_event.is_set():
+                    print("[QueueWorker] STOP signal received.")
+                    break
+
+                self._send(command, batch, ready_at)
+        except Exception:
+            batch["status"] = ABORTED
+            raise
+        finally:
+            batch["sent_all"] = True
+            self.active.remove(handle)
+            if self.stop_event.is_set():
+                batch["status"] = ABORTED
+                self._abandon_in_flight()
+                if handle.interrupted_at is None:
+                    handle.interrupted_at = handle.acked
+            if batch["pending"] == 0:
+                self._finish_batch(batch)
+
+    def _recover_from_abort(self):
+        # Back to a clean idle state, with the answers to abandoned commands off
+        # the line so none of them is taken for the ack of new traffic
+        self._abandon_in_flight()
+        interrupted, self.interrupted = self.interrupted, None
+        position = None
+        if self.abort_requested_at is not None and self.link_up():
+            if self.feed_hold:
+                # The halt report ends the flushed commands and says where the head is
+                position = self._wait_halt_report(self.abort_requested_at + HALT_REPORT_TIMEOUT)
+                if position is None:
+                    print("[QueueWorker] No halt report, position unknown")
+                    self._flush_firmware_line()
+            elif self._drain_answers(interrupted["unanswered"] if interrupted else 0):
+                # Everything sent has run, the head is at the last commanded target
+                position = {axis: value for axis, value in self.position.items() if value is not None}
+            else:
+                print("[QueueWorker] Sent commands not all answered, position unknown")
+                self._flush_firmware_line()
+        halted_at = time.monotonic()
+        self.position = {axis: (position or {}).get(axis) for axis in "XYZA"}
+        self.stop_event.clear()
+
+        requested_at = self.abort_requested_at or halted_at
+        self.abort_requested_at = None
+        handle = interrupted["batch"] if interrupted else None
+        self.last_abort = {
+            "reason": self.abort_reason,
+            "command": interrupted["command"] if interrupted else None,
+            "index": handle.interrupted_at if handle is not None else None,
+            "lane": handle.lane if handle is not None else None,
+            "position": dict(self.position) if position else None,
+            "halt_ms": round((halted_at - requested_at) * 1000, 1),
+            "feed_hold": self.feed_hold,
+        }
+        self.abort_reason = "stop"
+        print(f"[QueueWorker] Idle after abort: {self.last_abort}")
+        self.aborted.emit(dict(self.last_abort))
+
+    def _wait_halt_report(self, deadline):
+        # {axis: value} from the POS:...; the firmware answers HALT with, or None
+        while True:
+            response = self.transport.next_response()
+            if response is None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or not self.transport.alive:
+                    return None
+                self._wait_events(remaining)
+            elif response.kind == POSITION:
+                return response.axes
+
+    def _drain_answers(self, count):
+        # Takes the OK; / ER:..; of `count` abandoned commands off the line as
+        # they finish. False if one does not come within ABORT_DRAIN_TIMEOUT.
+        deadline = time.monotonic() + ABORT_DRAIN_TIMEOUT
+        while count > 0:
+            response = self.transport.next_response()
+            if response is None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or not self.transport.alive:
+                    return False
+                self._wait_events(remaining)
+            elif response.kind in (OK, ERROR):
+                count -= 1
+                deadline = time.monotonic() + ABORT_DRAIN_TIMEOUT
+        return True
+
+    def _flush_firmware_line(self):
+        # A bare ';' ends whatever half line the firmware holds (a "!" it did
+        # not act on), so the next command is not read as "!H3;". Its answer,
+        # and anything else still coming, is dropped.
+        try:
+            self.transport.write(b";")
+        except (serial.SerialException, OSError) as e:
+            print(f"[QueueWorker] Line flush not sent: {e}")
+        deadline = time.monotonic() + HALT_REPORT_TIMEOUT
+        while time.monotonic() < deadline and self.transport.alive:
+            self._wait_events(deadline - time.monotonic())
+        self.transport.clear()
 
     def run(self):
         while self.running:
             try:
-                command_list, callback = self.command_queue.get(timeout=0.1)
-                if not command_list:
+                if self._next_port is not None:
+                    self._attach_port()
+                if self.stop_event.is_set():
+                    self._recover_from_abort()
+                    continue
+                if not self.link_up():
+                    # No controller: keep the queue, drop what was in flight
+                    self._abandon_in_flight()
+                    if self.transport is not None and not self._link_reported:
+                        self._link_reported = True
+                        self.link_lost.emit(str(self.transport.error or "reader stopped"))
+                    self._set_busy(False)
+                    self._wait_events()
                     continue
 
-                for command in command_list:
-                    if self.stop_event.is_set():
-                        print("[QueueWorker] STOP signal received.")
-                        break
+                item = self._take()
+                if item is None:
+                    if self.in_flight:
+                        # Keep the firmware look-ahead fed: handle acks as they
+                        # come, but wake straight away if new work is queued.
+                        if not self._collect_ack(block=False):
+                            self._wait_events()
+                    else:
+                        self._set_busy(False)
+                        self._wait_events()
+                        # Nothing is waiting for an answer, just show what came in
+                        response = self.transport.next_response()
+                        while response is not None:
+                            if self.verbose:
+                                print(response.text)
+                            response = self.transport.next_response()
+                    continue
+
+                lane, command_list, handle = item
+                if not command_list:
+                    self.active.remove(handle)
+                    self._finish_unstarted(handle, BATCH_OK)
+                    continue
+                self._set_busy(True)
+                self._run_batch(lane, command_list, handle)
 
-                    self.arduino.write(command.strip().encode('Ascii'))
-                    self.arduino.flush()
-                    self.log_signal.emit(f"[QueueWorker] Sent: {command.strip()}")
-                    
-                    while not self.stop_event.is_set():
-                        if self.stop_event.is_set():
-                            break
-
-                        line = self.arduino.read_until(';'.encode('Ascii'))
-                        # print(line)
-                        print(f"{line.decode('Ascii').strip()}")
-                        # print()
-                        if line.decode('Ascii').strip()=="OK;" or line.decode('Ascii')[:5] == "Error":
-                            break
-                        if line.decode('Ascii').strip()=="ER:1;" or line.decode('Ascii')[:5] == "Error":
-                            break
-
-                if callback:
-                    QTimer.singleShot(0, lambda: callback())
-
-            except queue.Empty:
-                continue
             except Exception as e:
                 print(f"[QueueWorker Error] {e}")
-            
-            print("[Worker] Finished Signal emitted")
-            self.finished_batch_signal.emit(callback)
+                self._abandon_in_flight()
+
+        if self.transport is not None:
+            self.transport.close()
+        self.selector.close()
+        os.close(self._wake_r)
+        os.close(self._wake_w)
 
 
 
@@ -108,42 +810,90 @@ class LHSFunction():
             self.Ejected = 0.0
             self.isProcedureDone = False
             self.Dispense_val = 0
+            self.recorded_batches = None
+            self.optimize_gcode = True
+            self.plan_routes = True
+            self.pause_on_deck_change = True
+            self.worker = None
+            self.serial_state = CONNECTING
+            self.connect_time = None  # seconds until the controller answered, per connect
+            self.feed_hold = False  # the controller stops mid-move on HALT, probed per connect
+            self.firmware_config = FirmwareConfigShadow()
+            self.replay = None  # BatchHandle of the running replay_file()
+            self.replay_path = None
             
             
             self.init_serial()
 
 
     def init_serial(self):
-            # while True:
+        # Returns straight away: the port is found and handshaken in the
+        # background, the worker holds commands until then.
+        self.worker = CommandQueueWorker(None, window=STREAM_WINDOW, window_bytes=STREAM_WINDOW_BYTES)
+        # self.worker.log_signal.connect(self.log)
+        self.worker.busy_changed.connect(self._handle_worker_busy)
+        self.worker.link_lost.connect(self._handle_link_lost)
+        self.worker.start()
+
+        self.connection = SerialConnectionManager(SERIAL_PORT)
+        # self.connection = SerialConnectionManager('/dev/Serial0')
+        self.connection.state_changed.connect(self._handle_serial_state)
+        self.connection.ready.connect(self._handle_serial_ready)
+        self.connection.connect_async()
+
         try:
             self.start_box_detection()
-            self.arduino = serial.Serial('/dev/ttyUSB0', 115200, timeout=None)
-            # self.arduino = serial.Serial('/dev/Serial0', 115200, timeout=None)
-            time.sleep(2)
-            self.arduino.flush()
-            self.arduino.reset_input_buffer()
-            self.arduino.reset_output_buffer()
-            
-
-            print("[Arduino] Connected successfully.")
-            self.worker = CommandQueueWorker(self.arduino)
-            # self.worker.log_signal.connect(self.log)
-            self.worker.finished_batch_signal.connect(self._handle_batch_done)
-            self.worker.start()
+        except Exception as e:
+            print(f"[Detection] Not started: {e}")
 
-            # Send startup values
-            self.send_start_up_values()
-            # if(self.arduino):break
+    def _handle_serial_state(self, state, detail):
+        self.serial_state = state
 
-        except Exception as e:
-            print(f"[Arduino] Connection error: {e}")
+    def _handle_serial_ready(self, arduino, elapsed, feed_hold):
+        self.arduino = arduino
+        self.connect_time = elapsed
+        self.feed_hold = feed_hold
+        print(f"[Arduino] Connected successfully on {arduino.port}, first command possible after {elapsed:.2f} s.")
+        self.worker.set_port(arduino, feed_hold)
+
+        # A fresh controller knows nothing: config again, and it has to be homed
+        self.home_done = False
+        self.IsStartupSend = False
+        self.firmware_config.invalidate()
+        self.send_start_up_values()
+
+    def _handle_link_lost(self, reason):
+        print(f"[Arduino] Connection lost: {reason}")
+        self.firmware_config.invalidate()
+        self.home_done = False
+        self.IsStartupSend = False
+        self.connection.link_lost(reason)
 
 # ======================================================= Object Detection Starts ==========================================================
     def start_box_detection(self):
         self.box_thread = BoxDetectionThread()
         self.box_thread.detection_result.connect(self.handle_box_detection_result)
+        self.box_thread.deck_changed.connect(self.handle_deck_changed)
         self.box_thread.start()
 
+    def _handle_worker_busy(self, busy):
+        # Watch the deck only while the machine is actually running commands
+        if not hasattr(self, 'box_thread'):
+            return
+        if busy:
+            self.box_thread.start_monitoring()
+        else:
+            self.box_thread.stop_monitoring()
+
+    def handle_deck_changed(self, status, missing_boxes):
+        if status != 5 and self.pause_on_deck_change and self.worker:
+            print(f"[Monitor] Pausing run, missing: {missing_boxes}")
+            self.worker.pause()
+
+    def resume_run(self):
+        if self.worker:
+            self.worker.resume()
+
     def handle_box_detection_result(self, status, missing_boxes):
         if status == 5:
             print("✅ All boxes detected.")
@@ -155,22 +905,217 @@ class LHSFunction():
 
 # ======================================================= Object Detection Ends ==========================================================
         
-    def enqueue_commands(self, command_list, on_done_callback=None):
+    def enqueue_commands(self, command_list, on_done_callback=None, lane=BULK, replace=None):
+        # Returns the BatchHandle (None while recording or without a worker)
+        if self.recorded_batches is not None:
+            self.recorded_batches.append(list(command_list))
+            return None
         print("EnqueeCoomnads")
         if self.worker:
             print("Worker.enqueue")
-            self.worker.enqueue(command_list, on_done_callback)
+            return self.worker.enqueue(command_list, on_done_callback, lane, replace)
+        return None
+
+    def jog(self, targets):
+        # targets {"X": 12.3, ...}: one move; a jog still waiting in the queue is replaced
+        move = "G0" + "".join(f"{axis}{targets[axis]}" for axis in "XYZA" if axis in targets) + ";"
+        return self.enqueue_commands([move], lane=INTERACTIVE, replace=JOG)
+
+    def cancel_jog(self):
+        # Drops jogs that have not been sent yet, returns how many. One already
+        # sent still runs to its target.
+        if not self.worker:
+            return 0
+        return self.worker.cancel_pending(JOG)
+
+    def stop_jog(self):
+        # Release of a held jog button: drops the jogs not sent yet and, with
+        # feed hold, halts the one in flight so the head stops where the button
+        # was let go. True if the halt went out; the worker's abort report then
+        # says where the head is. Anything but jogs running: no halt.
+        if not self.worker:
+            return False
+        self.worker.cancel_pending(JOG)
+        if not self.worker.feed_hold:
+            return False
+        return self.worker.abort("jog release", only_key=JOG) is not None
 
-    def _handle_batch_done(self, callback):
-        if(callback) :
-            callback()
+    def record_commands(self, procedure):
+        # Run a procedure without sending anything, returns the batches it would enqueue.
+        # Works for generator procedures and ones that call enqueue_commands().
+        self.recorded_batches = []
+        try:
+            batches = procedure()
+            if batches is not None:
+                self.recorded_batches.extend(list(batch) for batch in batches)
+            return self.recorded_batches
+        finally:
+            self.recorded_batches = None
+
+    def _stream_procedure(self, procedure):
+        # Commands of a generator procedure, built only as the worker asks for them
+        commands = (command for batch in procedure() for command in batch)
+        if not self.optimize_gcode:
+            yield from commands
+            return
+        optimizer = GcodeOptimizer()
+        yield from optimizer.optimize_stream(commands)
+        print(f"[Optimizer] {optimizer.report()}")
+
+    def _compiled_commands(self, procedure, start_at=0):
+        # (commands, artifact): the procedure's command stream, from the on-disk
+        # artifact when nothing it depends on has changed (close it when done);
+        # otherwise built as usual and saved as it streams (artifact None)
+        name = procedure.__name__
+        key = artifact_key(name, files=PROTOCOL_FILES, options=(self.optimize_gcode, self.plan_routes))
+        artifact = load_artifact(name, key)
+        if artifact is None:
+            print(f"[Artifact] Compiling {name}")
+            return itertools.islice(recording_stream(name, key, self._stream_procedure(procedure)), start_at, None), None
+        print(f"[Artifact] {name}: {len(artifact)} commands from {artifact.path}")
+        return artifact.commands(start_at), artifact
+
+    def run_procedure(self, procedure, on_done_callback=None, start_at=0):
+        # The worker pulls the next batch when the pipeline has room, so the head
+        # starts moving on the first batch and nothing holds the whole run.
+        # start_at skips the commands an interrupted run already did.
+        if self.recorded_batches is not None or not self.worker:
+            return self.enqueue_commands(list(self._stream_procedure(procedure))[start_at:], on_done_callback)
+        commands, artifact = self._compiled_commands(procedure, start_at)
+        previous = read_journal() if start_at else None
+
+        def start_journal():
+            # On the worker thread, once the run before this one has closed its journal
+            try:
+                return RunJournal().start(procedure.__name__, start_at, previous)
+            except (OSError, ValueError) as e:
+                print(f"[Journal] Not recording this run: {e}")
+                return None
+
+        handle = self.worker.enqueue(commands, on_done_callback, BULK, journal_factory=start_journal)
+        if artifact is not None:
+            handle.add_done_callback(lambda handle: artifact.close())
+        return handle
+
+    def start_procedure(self, name, on_done_callback=None):
+        # run_procedure() by name, for callers that cannot pass the method (backend API)
+        if name not in PROCEDURES:
+            print(f"[Procedure] Unknown procedure {name!r}")
+            return None
+        return self.run_procedure(getattr(self, name), on_done_callback)
+
+    def replay_file(self, path, on_done_callback=None, start_at=0):
+        # Streams a .gcode file (or a compiled .lhsc artifact) to the machine.
+        # The worker pulls one command at a time from the mapped file, so a file
+        # with millions of lines runs at constant memory.
+        if not self.worker:
+            return None
+        source = open_replay(path)
+        total = len(source)
+        handle = self.worker.enqueue(source.commands(start_at), on_done_callback, BULK, total=max(0, total - start_at))
+
+        def on_replay_done(handle):
+            progress = replay_progress(handle)
+            print(f"[Replay] {path}: {handle.status}, {progress['acked']}/{progress['total']} "
+                  f"commands at {progress['rate']} /s")
+            if self.replay is handle:
+                self.replay = None
+            source.close()
+
+        handle.add_done_callback(on_replay_done)
+        self.replay = handle
+        self.replay_path = path
+        print(f"[Replay] {path}: {total} commands")
+        return handle
+
+    def replay_status(self):
+        # Progress and ETA of the running replay, None when there is none
+        if self.replay is None:
+            return None
+        status = replay_progress(self.replay)
+        status["path"] = self.replay_path
+        return status
+
+    def pipeline_metrics(self, reset=False):
+        # Latency percentiles per command kind, rate and depth gauges (None when disabled)
+        metrics = self.worker.metrics if self.worker else None
+        if metrics is None:
+            return None
+        snapshot = self.worker.metrics_snapshot(metrics)
+        if reset:
+            metrics.reset()
+        return snapshot
+
+    def dump_pipeline_metrics(self, path=METRICS_DUMP):
+        # Snapshot plus raw histogram buckets as JSON, returns the path
+        metrics = self.worker.metrics if self.worker else None
+        if metrics is None:
+            return None
+        return metrics.dump(path, self.worker.metrics_snapshot(metrics))
+
+    def set_pipeline_metrics(self, enabled):
+        if self.worker:
+            self.worker.set_metrics_enabled(enabled)
+
+    def resume_info(self):
+        # The journal of the last run if it can be picked up again, else None
+        info = read_journal()
+        if info is None or info["state"] == "complete" or info["last_acked"] is None:
+            return None
+        return info
+
+    def resume_interrupted_run(self, on_done_callback=None):
+        # Starts the last run again at the tip cycle it was in when it stopped.
+        # The machine has to be homed first; the stream is rebuilt and checked
+        # against the journal so a changed protocol or calibration is not resumed.
+        info = self.resume_info()
+        if info is None:
+            print("[Journal] Nothing to resume")
+            return None
+        if not self.home_done:
+            print("[Journal] Home the machine before resuming")
+            return None
+        procedure = getattr(self, info["procedure"], None)
+        if procedure is None or info["procedure"] not in RESUMABLE_PROCEDURES:
+            print(f"[Journal] {info['procedure']!r} cannot be resumed")
+            return None
+        resume_at = info["resume_at"]
+        if resume_at:
+            commands, artifact = self._compiled_commands(procedure, resume_at - 1)
+            before = next(commands, None)
+            if artifact is not None:
+                artifact.close()
+            if before is None or zlib.crc32(gcode_command(before).data) != info["resume_crc"]:
+                print("[Journal] Procedure changed since the run was interrupted, not resuming")
+                return None
+        print(f"[Journal] Resuming {info['procedure']} at command {resume_at} "
+              f"(last acked {info['last_acked']}, {info['tips']} tips used)")
+        return self.run_procedure(procedure, on_done_callback, start_at=resume_at)
+
+    def estimate_run_time(self, procedure):
+        # e.g. estimate_run_time(self.serial_Dilution)["total"] -> seconds
+        batches = self.record_commands(procedure)
+        return RunTimeEstimator().estimate_steps(batches)
+
+    def estimate_procedure(self, name):
+        # estimate_run_time() by name (backend API), plain lists so it pickles for the GUI
+        if name not in PROCEDURES:
+            print(f"[Procedure] Unknown procedure {name!r}")
+            return None
+        estimate = self.estimate_run_time(getattr(self, name))
+        estimate["command_times"] = estimate["command_times"].tolist()
+        return estimate
 
 # =========================== Procedures =======================================
 
     def send_start_up_values(self):
         file_path = "calibration/Machine_Code/start_up_values.json"
 
-        def isDone():
+        def isDone(handle):
+            self.firmware_config.mark_applied(entries, handle)
+            if handle.status != BATCH_OK:
+                print(f"[StartUp] Values not applied ({handle.status}): {handle.errors}")
+                return
             print("StartUp Values Send")
             self.IsStartupSend = True
         
@@ -212,46 +1157,25 @@ class LHSFunction():
                     "Comments6": "C6X{HOMING_FEED_X}"
                 }
 
-        commands = [
-           f'C1X{data["SPMMS_X"]};',
-           f'C1Y{data["SPMMS_Y"]};',
-           f'C1Z{data["SPMMS_Z"]};',
-           f'C1A{data["SPMMS_A"]};',
-
-           f'C2X{data["MAX_FEED_X"]};',
-           f'C2Y{data["MAX_FEED_Y"]};',
-           f'C2Z{data["MAX_FEED_Z"]};',
-           f'C2A{data["MAX_FEED_A"]};',
-
-           f'C3X{data["MAX_ACCELS_X"]};',
-           f'C3Y{data["MAX_ACCELS_Y"]};',
-           f'C3Z{data["MAX_ACCELS_Z"]};',
-           f'C3A{data["MAX_ACCELS_A"]};',
-
-           f'C4X{data["MAX_TRAVELS_X"]};',
-           f'C4Y{data["MAX_TRAVELS_Y"]};',
-           f'C4Z{data["MAX_TRAVELS_Z"]};',
-           f'C4A{data["MAX_TRAVELS_A"]};',
-
-           f'C5X{data["OFFSETS_X"]};',
-           f'C5Y{data["OFFSETS_Y"]};',
-           f'C5Z{data["OFFSETS_Z"]};',
-           f'C5A{data["OFFSETS_A"]};',
-
-
-           f'C6X{data["HOMING_FEED_X"]};',
-           f'C6Y{data["HOMING_FEED_Y"]};',
-           f'C6Z{data["HOMING_FEED_Z"]};',
-           f'C6A{data["HOMING_FEED_A"]};'
-        ]
-
-        print("D5;")
-        self.enqueue_commands(["D5;"]) # First Command for debugging
-        print("Sending is Done Callback")
-        self.enqueue_commands(commands, on_done_callback=isDone)
+        # Only what the controller does not hold yet
+        entries = self.firmware_config.diff(data)
+        commands = [command for _, _, command in entries]
 
-        with open(file_path, "w") as f:
-            json.dump(data, f, indent=4)
+        if not commands:
+            print("[Config] Controller already has these values")
+            self.IsStartupSend = True
+        else:
+            print(f"[Config] Sending {len(commands)} of {len(config_commands(data))} values")
+            print("D5;")
+            self.enqueue_commands(["D5;"], lane=INTERACTIVE) # First Command for debugging
+            print("Sending is Done Callback")
+            handle = self.enqueue_commands(commands, lane=INTERACTIVE)
+            if handle:
+                handle.add_done_callback(isDone)
+
+        if not os.path.exists(file_path):
+            with open(file_path, "w") as f:
+                json.dump(data, f, indent=4)
 
     def start_action(self):
         print("Start button clicked")
@@ -259,15 +1183,15 @@ class LHSFunction():
     def Aspirate_Func(self):
         print("Aspirate button clicked")
         self.Dispense_val = 0;
-        self.enqueue_commands(["G0A0;"])
+        self.enqueue_commands(["G0A0;"], lane=INTERACTIVE)
     
     def dispense_Func(self):
         print("dispense button clicked")
         self.Dispense_val = self.Dispense_val+50
-        self.enqueue_commands([f"G0A{self.Dispense_val};"])
+        self.enqueue_commands([f"G0A{self.Dispense_val};"], lane=INTERACTIVE)
 
     def eject_Func(self):
-        self.enqueue_commands(["E0;"])
+        self.enqueue_commands(["E0;"], lane=INTERACTIVE)
 
 # =========================== Procedures =========================================
   
@@ -350,42 +1274,43 @@ class LHSFunction():
     #         ])
 
     def check_Tip_Box(self):
+        # Generator: yields one command batch at a time, run it with run_procedure()
         self.plasticus_coordinates = CoordinateConversion()
         commands = self.plasticus_coordinates.get_Plasticus_Tip_Box_List()
         ejection = self.plasticus_coordinates.get_Ejection_Area()
 
         for val in commands:
-            self.enqueue_commands([val])
-            self.enqueue_commands([
+            yield [val]
+            yield [
                 "G0Z176.5;",   # Insert
                 "G0Z80;",  # Lower
                 f"G0X{ejection[0]}Y{ejection[1]};", #Ejection Area
                 "E0;", #Eject
-            ])
+            ]
 
     def check_Well_Plate(self):
+        # Generator: yields one command batch at a time, run it with run_procedure()
         self.plasticus_coordinates = CoordinateConversion()
         commands = self.plasticus_coordinates.get_Plasticus_One_Well_Plate_List()
         ejection = self.plasticus_coordinates.get_Ejection_Area()
-        self.enqueue_commands([
+        yield [
             "G0X9.2Y44.8;"
             "G0Z176.5;",   # Insert
             "G0Z80;",  # Lower
-        ])
+        ]
 
         for val in commands:
-            print(f"val = {val}")
-            self.enqueue_commands([val])
-            self.enqueue_commands([
+            yield [val]
+            yield [
                 "G0Z176.5;",   # Insert
                 "G0Z150;",  # UP
-            ])
+            ]
             
-        self.enqueue_commands([
+        yield [
             "G0Z80;",  # Lower
             f"G0X{ejection[0]}Y{ejection[1]};", #Ejection Area
             "E0;", #Eject
-        ])
+        ]
     
     # def Diagonal_Liquid_Drop(self):
     #     self.plasticus_coordinates = CoordinateConversion()
@@ -553,301 +1478,250 @@ class LHSFunction():
     #                 "G0A150;"     
     #             ])
 
+    def _dispense_pass(self, wells, volumes, start=None, keep_order=False):
+        # One aspirate cycle: dispense volumes[n] into wells[n]. The plunger (A)
+        # target is cumulative, so it is worked out after the visiting order.
+        # keep_order=True for passes where the order matters chemically.
+        # Yields the command batches, like the procedures below.
+        order = list(range(len(wells)))
+        if self.plan_routes and not keep_order:
+            order = WellRoutePlanner().order([xy_from_gcode(well) for well in wells], start=start)
+
+        disp = 0
+        for index in order:
+            disp = disp + volumes[index]
+            yield [wells[index]]
+            yield [
+            "G0Z177;", #Lower
+            f"G0Z176A{disp};", #dispense
+            "G0Z160;" # Clear
+            ]
+
     def serial_Dilution(self):
+        # Generator: yields one command batch at a time, run it with run_procedure()
         self.plasticus_coordinates = CoordinateConversion()
         Tip_Box_List = self.plasticus_coordinates.get_Plasticus_Tip_Box_List()
         First_Well_PLate_List = self.plasticus_coordinates.get_Plasticus_One_Well_Plate_List()
         Second_Well_PLate_List = self.plasticus_coordinates.get_Plasticus_Two_Well_Plate_List()
         ejection = self.plasticus_coordinates.get_Ejection_Area()
+        reagent_boxes = [
+            self.plasticus_coordinates.get_First_Reagent_Box(),
+            self.plasticus_coordinates.get_Second_Reagent_Box(),
+            self.plasticus_coordinates.get_Third_Reagent_Box(),
+            self.plasticus_coordinates.get_Fourth_Reagent_Box(),
+        ]
+        reagent_moves = [f"G0X{box[0]}Y{box[1]};" for box in reagent_boxes]
 
         for i in range(0, 32):
             if(i<4):
-                self.enqueue_commands([Tip_Box_List[i]])
-                self.enqueue_commands([
+                reagent = reagent_boxes[i]
+                reagent_move = reagent_moves[i]
+                yield [Tip_Box_List[i]]
+                yield [
                     "G0Z176.5;",   # Insert
                     "G0Z80;",  # clear
-                ])
-                if(i==0):
-                    self.enqueue_commands([f"G0X{self.plasticus_coordinates.get_First_Reagent_Box()[0]}Y{self.plasticus_coordinates.get_First_Reagent_Box()[1]};"])
-                
-                elif(i==1):
-                    self.enqueue_commands([f"G0X{self.plasticus_coordinates.get_Second_Reagent_Box()[0]}Y{self.plasticus_coordinates.get_Second_Reagent_Box()[1]};"])
-                
-                elif(i==2):
-                    self.enqueue_commands([f"G0X{self.plasticus_coordinates.get_Third_Reagent_Box()[0]}Y{self.plasticus_coordinates.get_Third_Reagent_Box()[1]};"])
-                
-                elif(i==3):
-                    self.enqueue_commands([f"G0X{self.plasticus_coordinates.get_Fourth_Reagent_Box()[0]}Y{self.plasticus_coordinates.get_Fourth_Reagent_Box()[1]};"])
-                
-                self.enqueue_commands([
+                ]
+                yield [reagent_move]
+                yield [
                     "G0Z162;", #Dip
                     "G0Z170A0;", #Aspirate
                     "G0Z100;" #Clear
-                ])
+                ]
                 x = i*12
-                disp = 0
-                for j in range(x, x+3):
-                    self.enqueue_commands([First_Well_PLate_List[j]])
-                    if j == x+2: 
-                        disp = disp + 50
-                    disp = disp + 50
-                    self.enqueue_commands([
-                    "G0Z177;", #Lower
-                    f"G0Z176A{disp};", #dispense
-                    "G0Z160;" # Clear
-                    ])
-                self.enqueue_commands([
+                yield from self._dispense_pass(First_Well_PLate_List[x:x+3], [50, 50, 100], start=reagent)
+                yield [
                     "G0Z80;" #Clear
-                ])
+                ]
 
-                if(i==0):
-                    self.enqueue_commands([f"G0X{self.plasticus_coordinates.get_First_Reagent_Box()[0]}Y{self.plasticus_coordinates.get_First_Reagent_Box()[1]};"])
-                
-                elif(i==1):
-                    self.enqueue_commands([f"G0X{self.plasticus_coordinates.get_Second_Reagent_Box()[0]}Y{self.plasticus_coordinates.get_Second_Reagent_Box()[1]};"])
-                
-                elif(i==2):
-                    self.enqueue_commands([f"G0X{self.plasticus_coordinates.get_Third_Reagent_Box()[0]}Y{self.plasticus_coordinates.get_Third_Reagent_Box()[1]};"])
-                
-                elif(i==3):
-                    self.enqueue_commands([f"G0X{self.plasticus_coordinates.get_Fourth_Reagent_Box()[0]}Y{self.plasticus_coordinates.get_Fourth_Reagent_Box()[1]};"])
-                
-                self.enqueue_commands([
+                yield [reagent_move]
+                yield [
                     "G0Z162;", #Dip
                     "G0Z170A0;", #Aspirate
                     "G0Z100;" #Clear
-                ])
+                ]
 
                 l = (i*12 )+3
-                disp = 0
-                for k in range (l, l+3):
-                    self.enqueue_commands([First_Well_PLate_List[k]])
-                    if k == l+2: 
-                        disp = disp + 50
-                    disp = disp + 50
-                    self.enqueue_commands([
-                    "G0Z177;", #Lower
-                    f"G0Z176A{disp};", #dispense
-                    "G0Z160;" # Clear
-                    ])
+                yield from self._dispense_pass(First_Well_PLate_List[l:l+3], [50, 50, 100], start=reagent)
 
-                self.enqueue_commands([
+                yield [
                     "G0Z80;",  # Clear
                     f"G0X{ejection[0]}Y{ejection[1]};", #Ejection Area
                     "E0;", #Eject
                     "G0A150;"     
-                ])
+                ]
                 # pass
 
             elif(i>=4 and i<8):
                 # pass
+                reagent = reagent_boxes[i-4]
+                reagent_move = reagent_moves[i-4]
                 if(i==4):
                     #  ======================= Tip Selection =================================
-                    self.enqueue_commands([Tip_Box_List[i]])
+                    yield [Tip_Box_List[i]]
 
 
-                    self.enqueue_commands([
+                    yield [
                         "G0Z176.5;",   # Insert
                         "G0Z80;",  # clear
-                    ])
+                    ]
 
                     # ===================== Selecting First Reagent Box ===================================
 
-                    self.enqueue_commands([f"G0X{self.plasticus_coordinates.get_First_Reagent_Box()[0]}Y{self.plasticus_coordinates.get_First_Reagent_Box()[1]};"])
-                    self.enqueue_commands([
+                    yield [reagent_move]
+                    yield [
                         "G0Z162;", #Dip
                         "G0Z170A0;", #Aspirate
                         "G0Z100;" #Clear
-                    ])
+                    ]
                     x = i*12
-                    disp = 0
-                    for j in range(x, x+3):
-                        self.enqueue_commands([First_Well_PLate_List[j]])
-                        if j == x+2: 
-                            disp = disp + 50
-                        disp = disp + 50
-                        self.enqueue_commands([
-                        "G0Z177;", #Lower
-                        f"G0Z176A{disp};", #dispense
-                        "G0Z160;" # Clear
-                        ])
-
-                    self.enqueue_commands([
+                    yield from self._dispense_pass(First_Well_PLate_List[x:x+3], [50, 50, 100], start=reagent)
+
+                    yield [
                         "G0Z80;",  # Clear
                         f"G0X{ejection[0]}Y{ejection[1]};", #Ejection Area
                         "E0;", #Eject
                         "G0A150;"     
-                    ])
+                    ]
                 elif(i==5):
                     #  ======================= Tip Selection =================================
-                    self.enqueue_commands([Tip_Box_List[i]])
+                    yield [Tip_Box_List[i]]
 
 
-                    self.enqueue_commands([
+                    yield [
                         "G0Z176.5;",   # Insert
                         "G0Z80;",  # clear
-                    ])
-                    self.enqueue_commands([f"G0X{self.plasticus_coordinates.get_Second_Reagent_Box()[0]}Y{self.plasticus_coordinates.get_Second_Reagent_Box()[1]};"])
-                    self.enqueue_commands([
+                    ]
+                    yield [reagent_move]
+                    yield [
                         "G0Z162;", #Dip
                         "G0Z170A0;", #Aspirate
                         "G0Z100;" #Clear
-                    ])
-                    disp = 0
+                    ]
                     x = (i-1)*12
-                    for j in range(x, x+3):
-                        self.enqueue_commands([First_Well_PLate_List[j]])
-                        if j == x+2: 
-                            disp = disp + 50
-                        disp = disp + 50
-                        self.enqueue_commands([
-                        "G0Z177;", #Lower
-                        f"G0Z176A{disp};", #dispense
-                        "G0Z160;" # Clear
-                        ])
-
-                    self.enqueue_commands([
+                    yield from self._dispense_pass(First_Well_PLate_List[x:x+3], [50, 50, 100], start=reagent)
+
+                    yield [
                         "G0Z80;",  # Clear
                         f"G0X{ejection[0]}Y{ejection[1]};", #Ejection Area
                         "E0;", #Eject
                         "G0A150;"     
-                    ])
+                    ]
                 elif i==6:
                     #  ======================= Tip Selection =================================
-                    self.enqueue_commands([Tip_Box_List[i]])
+                    yield [Tip_Box_List[i]]
 
 
-                    self.enqueue_commands([
+                    yield [
                         "G0Z176.5;",   # Insert
                         "G0Z80;",  # clear
-                    ])
+                    ]
                         #  =========================== Third Reagent Box =======================
 
-                    self.enqueue_commands([f"G0X{self.plasticus_coordinates.get_Third_Reagent_Box()[0]}Y{self.plasticus_coordinates.get_Third_Reagent_Box()[1]};"])
-                    self.enqueue_commands([
+                    yield [reagent_move]
+                    yield [
                         "G0Z162;", #Dip
                         "G0Z170A0;", #Aspirate
                         "G0Z100;" #Clear
-                    ])
+                    ]
 
                     l = ((i-2)*12)+3
-                    disp = 0
-                    for k in range (l, l+3):
-                        self.enqueue_commands([First_Well_PLate_List[k]])
-                        if k == l+2: 
-                            disp = disp + 50
-                        disp = disp + 50
-                        self.enqueue_commands([
-                        "G0Z177;", #Lower
-                        f"G0Z176A{disp};", #dispense
-                        "G0Z160;" # Clear
-                        ])
-
-                    self.enqueue_commands([
+                    yield from self._dispense_pass(First_Well_PLate_List[l:l+3], [50, 50, 100], start=reagent)
+
+                    yield [
                         "G0Z80;",  # Clear
                         f"G0X{ejection[0]}Y{ejection[1]};", #Ejection Area
                         "E0;", #Eject
                         "G0A150;"     
-                    ])
+                    ]
                 elif(i==7):
                     #  ======================= Tip Selection =================================
-                    self.enqueue_commands([Tip_Box_List[i]])
+                    yield [Tip_Box_List[i]]
 
 
-                    self.enqueue_commands([
+                    yield [
                         "G0Z176.5;",   # Insert
                         "G0Z80;",  # clear
-                    ])
-                    self.enqueue_commands([f"G0X{self.plasticus_coordinates.get_Fourth_Reagent_Box()[0]}Y{self.plasticus_coordinates.get_Fourth_Reagent_Box()[1]};"])
-                    self.enqueue_commands([
+                    ]
+                    yield [reagent_move]
+                    yield [
                         "G0Z162;", #Dip
                         "G0Z170A0;", #Aspirate
                         "G0Z100;" #Clear
-                    ])
+                    ]
                     l = ((i-3)*12 )+3
-                    disp = 0
-                    for k in range (l, l+3):
-                        self.enqueue_commands([First_Well_PLate_List[k]])
-                        if k == l+2: 
-                            disp = disp + 50
-                        disp = disp + 50
-                        self.enqueue_commands([
-                        "G0Z177;", #Lower
-                        f"G0Z176A{disp};", #dispense
-                        "G0Z160;" # Clear
-                        ])
-
-                    self.enqueue_commands([
+                    yield from self._dispense_pass(First_Well_PLate_List[l:l+3], [50, 50, 100], start=reagent)
+
+                    yield [
                         "G0Z80;",  # Clear
                         f"G0X{ejection[0]}Y{ejection[1]};", #Ejection Area
                         "E0;", #Eject
                         "G0A50;"     
-                    ])
+                    ]
                 
             elif(i==8):
                 #  ======================= Tip Selection =================================
-                self.enqueue_commands([Tip_Box_List[i]])
-                self.enqueue_commands([
+                yield [Tip_Box_List[i]]
+                yield [
                     "G0Z178;",   # Insert
                     "G0Z80;",  # clear
-                ])
+                ]
                 x = i*6
                 for j in range(x, x+3):
                     #  Aspiration from Well
-                    self.enqueue_commands([First_Well_PLate_List[j]])
-                    self.enqueue_commands([
+                    yield [First_Well_PLate_List[j]]
+                    yield [
                     "G0Z178;", #Lower
                     f"G0Z176A0;", #dispense
                     "G0Z160;" # Clear
-                    ])
+                    ]
 
 
-                    self.enqueue_commands([First_Well_PLate_List[j+12]])
-                    self.enqueue_commands([
+                    yield [First_Well_PLate_List[j+12]]
+                    yield [
                     "G0Z178;", #Lower
                     f"G0Z176A50;", #dispense
                     "G0Z160;" # Clear
-                    ])
+                    ]
 
-                self.enqueue_commands([
+                yield [
                     "G0Z80;",  # Clear
                     f"G0X{ejection[0]}Y{ejection[1]};", #Ejection Area
                     "E0;", #Eject
                     "G0A50;"
                          
-                ])
+                ]
 
             elif(i==9):
                 #  ======================= Tip Selection =================================
-                self.enqueue_commands([Tip_Box_List[i]])
-                self.enqueue_commands([
+                yield [Tip_Box_List[i]]
+                yield [
                     "G0Z178;",   # Insert
                     "G0Z80;",  # clear
-                ])
+                ]
                 l=((i-1)*6)+3
                 for k in range(l, l+3):
                     #  Aspiration from Well
-                    self.enqueue_commands([First_Well_PLate_List[k]])
-                    self.enqueue_commands([
+                    yield [First_Well_PLate_List[k]]
+                    yield [
                     "G0Z177;", #Lower
                     "G0Z176A0;", #dispense
                     "G0Z160;" # Clear
-                    ])
+                    ]
 
 
-                    self.enqueue_commands([First_Well_PLate_List[k+12]])
-                    self.enqueue_commands([
+                    yield [First_Well_PLate_List[k+12]]
+                    yield [
                     "G0Z177;", #Lower
                     "G0Z176A50;", #dispense
                     "G0Z160;" # Clear
-                    ])
-                self.enqueue_commands([
+                    ]
+                yield [
                     "G0Z80;",  # Clear
                     f"G0X{ejection[0]}Y{ejection[1]};", #Ejection Area
                     "E0;", #Eject
                     "G0A150;",
                     "G0X10Y10Z10A150;"     
-                ])
+                ]
 
 
 
@@ -874,6 +1748,7 @@ class LHSFunction():
         data1["OFFSETS_Y"] = round(data1["OFFSETS_Y"] + (data2['Plasticus_Tip_Box']['plasticus_A1_Y_val'] - round(Y_val, 2)), 2)
         with open(file_path1, "w") as f:
             json.dump(data1, f, indent=4)
+        coordinate_cache.invalidate()
         self.send_start_up_values()            
     
     def start_clicked(self):
@@ -881,11 +1756,11 @@ class LHSFunction():
         print("START clicked")
 
         # Running Procedure
-        # self.check_Well_Plate()
+        # self.run_procedure(self.check_Well_Plate)
         # self.Single_Tip_row_Ejection()
         # self.Single_Tip_Ejection()
-        # self.check_Tip_Box()
-        self.serial_Dilution()
+        # self.run_procedure(self.check_Tip_Box)
+        self.run_procedure(self.serial_Dilution)
         # self.create_line()
         # self.Diagonal_Liquid_Drop()
 
@@ -893,7 +1768,7 @@ class LHSFunction():
         print("STOP clicked - sending Dummy STOP to Arduino.")
         if(self.worker and self.worker.isRunning):
             print("Stopping worker thread...")
-            self.worker.stop()
+            self.worker.abort("stop button")
             print("Worker Stopped")
         else:
             print("No running worker to Stop!!!")
@@ -909,12 +1784,18 @@ class LHSFunction():
         # self.stop_event.clear()
         print("HOME clicked")
 
-        def on_home_done():
-            print("Home completed.")
+        def on_home_done(handle):
+            if handle.status != BATCH_OK:
+                print(f"[Home] Homing did not complete ({handle.status}).")
+                return
+            print(f"Home completed in {handle.timing()['run_ms'] / 1000:.1f} s.")
             self.home_done = True
 
         commands = ["H3;", "H2;", "H1;", "H0;", "G0A150;"]
         # commands = ["H2;", "H1;", "H0;"]
-        self.enqueue_commands(commands, on_done_callback=on_home_done)
+        handle = self.enqueue_commands(commands, lane=INTERACTIVE)
+        if handle:
+            handle.add_done_callback(on_home_done)
+        return handle
 
 
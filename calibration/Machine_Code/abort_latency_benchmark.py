@@ -0,0 +1,80 @@
+import sys
+import time
+import serial
+import argparse
+import statistics
+import threading
+
+from PyQt5.QtCore import Qt, QCoreApplication
+
+from .firmware_simulator import FirmwareSimulator
+from .Machine_Backend_V2 import CommandQueueWorker
+from .connection_manager import probe_feed_hold
+from .batch_handle import OK
+
+
+# Stop-to-still latency of CommandQueueWorker.abort() against the pty simulator
+# running in real time, and whether the worker takes new work afterwards.
+#
+#   python -m calibration.Machine_Code.abort_latency_benchmark --runs 20
+
+# Long moves so the abort always lands in the middle of one
+MOVES = ["G0X10Y10;", "G0X250Y200;", "G0X10Y10;", "G0X250Y200;"] * 5
+
+
+def measure_abort(worker, simulator, runs, window):
+    idle = threading.Event()
+    worker.aborted.connect(lambda _: idle.set(), Qt.DirectConnection)
+    still_ms = []
+    idle_ms = []
+    for run in range(runs):
+        idle.clear()
+        running = worker.enqueue(MOVES)
+        waiting = [worker.enqueue(MOVES) for _ in range(3)]
+        time.sleep(0.3 + 0.05 * (run % 5))  # somewhere inside the first moves
+
+        simulator.stats["halted_at"] = None
+        start = time.monotonic()
+        cancelled = worker.abort("benchmark")
+        if not idle.wait(2.0):
+            raise RuntimeError("Worker did not come back after abort")
+        idle_ms.append((time.monotonic() - start) * 1000)
+        if simulator.stats["halted_at"] is None:
+            raise RuntimeError("Simulator never halted")
+        still_ms.append((simulator.stats["halted_at"] - start) * 1000)
+
+        if running.result(1.0) != "aborted" or cancelled != len(waiting):
+            raise RuntimeError(f"Unexpected batch states: {running}, {waiting}")
+        if worker.enqueue(["D5;"]).result(1.0) != OK:
+            raise RuntimeError("Worker not reusable after abort")
+        report = worker.last_abort
+        print(f"[Benchmark] run {run + 1}: stopped at command {report['index']} ({report['command']}), "
+              f"{report['position']}")
+    return still_ms, idle_ms
+
+
+def summary(name, values):
+    values = sorted(values)
+    print(f"[Benchmark] {name:<14}: p50 {statistics.median(values):.2f} ms, max {values[-1]:.2f} ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="CommandQueueWorker abort latency benchmark")
+    parser.add_argument("--runs", type=int, default=20, help="aborts to measure")
+    parser.add_argument("--window", type=int, default=4, help="commands in flight")
+    args = parser.parse_args()
+
+    app = QCoreApplication(sys.argv)
+    simulator = FirmwareSimulator(time_scale=1.0)
+    port = simulator.start()
+    arduino = serial.Serial(port, 115200, timeout=None)
+    worker = CommandQueueWorker(arduino, window=args.window, feed_hold=probe_feed_hold(arduino))
+    worker.start()
+
+    still_ms, idle_ms = measure_abort(worker, simulator, args.runs, args.window)
+    summary("stop to still", still_ms)
+    summary("stop to idle", idle_ms)
+
+    worker.shutdown()
+    worker.wait()
+    simulator.stop()
@@ -0,0 +1,339 @@
+import os
+import sys
+import socket
+import argparse
+import threading
+import subprocess
+from multiprocessing.connection import Connection
+
+from PyQt5.QtCore import QObject, QCoreApplication, QSocketNotifier, QTimer, pyqtSignal
+
+
+# The hardware backend (LHSFunction: serial worker, box detection, coordinates)
+# runs in its own process. The GUI talks to it over a socketpair:
+#
+#   GUI -> backend  ("call", call_id, method, args, kwargs)
+#   backend -> GUI  ("result", call_id, ok, value)
+#                   ("event", name, data)   state / batch / deck telemetry
+#
+# Nothing on the GUI side blocks on the backend; results and telemetry arrive
+# through a QSocketNotifier on the GUI thread.
+
+# LHSFunction methods the GUI may call
+BACKEND_API = (
+    "enqueue_commands", "jog", "cancel_jog", "stop_jog", "home_clicked", "start_clicked", "stop_clicked", "resume_run",
+    "save_calibration", "send_start_up_values", "start_action", "Aspirate_Func",
+    "resume_info", "resume_interrupted_run", "replay_file", "replay_status",
+    "pipeline_metrics", "dump_pipeline_metrics", "set_pipeline_metrics",
+    "dispense_Func", "eject_Func", "start_procedure", "estimate_procedure",
+)
+
+# LHSFunction attributes mirrored into the GUI process
+STATE_KEYS = ("home_done", "IsStartupSend", "serial_state", "connect_time", "feed_hold")
+
+
+# ============================ Backend Side ==================================
+class BackendServer(QObject):
+    """Runs LHSFunction in the backend process and answers calls from the GUI."""
+
+    def __init__(self, conn):
+        super().__init__()
+        self.conn = conn
+        self.send_lock = threading.Lock()  # worker signals may arrive on other threads
+        self.lhs = None
+        self.batches = {}  # batch id -> BatchHandle still running
+        self.next_batch = 1
+        self.notifier = QSocketNotifier(conn.fileno(), QSocketNotifier.Read)
+        self.notifier.activated.connect(self._read_requests)
+
+    def start(self):
+        from .Machine_Backend_V2 import LHSFunction
+        self.lhs = LHSFunction()  # opens the serial port, may take a few seconds
+        worker = getattr(self.lhs, "worker", None)
+        if worker is not None:
+            worker.busy_changed.connect(self._send_state)
+        connection = getattr(self.lhs, "connection", None)
+        if connection is not None:
+            connection.state_changed.connect(self._send_state)
+        box_thread = getattr(self.lhs, "box_thread", None)
+        if box_thread is not None:
+            # Connected after LHSFunction.handle_deck_changed, so the worker
+            # is already paused (or not) when the event goes out
+            box_thread.deck_changed.connect(self._send_deck)
+        if worker is not None:
+            worker.aborted.connect(lambda report: self.send_event("abort", report))
+        self._send_state()
+
+    def send(self, message):
+        with self.send_lock:
+            try:
+                self.conn.send(message)
+            except (OSError, EOFError, BrokenPipeError):
+                pass
+
+    def send_event(self, name, data):
+        self.send(("event", name, data))
+
+    def _send_deck(self, status, missing):
+        worker = getattr(self.lhs, "worker", None)
+        paused = worker is not None and worker.paused
+        self.send_event("deck", {"status": status, "missing": missing, "paused": paused})
+
+    def _send_state(self, *_):
+        state = {key: getattr(self.lhs, key, None) for key in STATE_KEYS}
+        worker = getattr(self.lhs, "worker", None)
+        state["connected"] = worker is not None and worker.link_up()
+        state["busy"] = worker.busy if worker is not None else False
+        self.send_event("state", state)
+
+    def _read_requests(self):
+        try:
+            while self.conn.poll():
+                self._handle(self.conn.recv())
+        except (EOFError, OSError):
+            print("[Backend] GUI went away, shutting down")
+            self.notifier.setEnabled(False)
+            self.shutdown()
+
+    def _handle(self, message):
+        kind, call_id, method, args, kwargs = message
+        if kind != "call" or method not in BACKEND_API:
+            self.send(("result", call_id, False, f"Unknown call {method!r}"))
+            return
+        try:
+            value = getattr(self.lhs, method)(*args, **kwargs)
+        except Exception as e:
+            print(f"[Backend] {method} failed: {e}")
+            self.send(("result", call_id, False, str(e)))
+            return
+        self.send(("result", call_id, True, self._export(value)))
+        self._send_state()
+
+    def _export(self, value):
+        # BatchHandles stay here; the GUI gets an id and a "batch" event when it ends
+        if hasattr(value, "add_done_callback") and hasattr(value, "timing"):
+            batch_id = self.next_batch
+            self.next_batch += 1
+            self.batches[batch_id] = value
+            value.add_done_callback(lambda handle: self._batch_done(batch_id, handle))
+            return {"batch": batch_id}
+        if value is None or isinstance(value, (bool, int, float, str, list, tuple, dict)):
+            return value
+        return repr(value)
+
+    def _batch_done(self, batch_id, handle):
+        self.batches.pop(batch_id, None)
+        self.send_event("batch", {
+            "id": batch_id,
+            "status": handle.status,
+            "acked": handle.acked,
+            "total": handle.total,
+            "errors": handle.errors,
+            "interrupted_at": handle.interrupted_at,
+            "timing": handle.timing(),
+        })
+        self._send_state()
+
+    def shutdown(self):
+        worker = getattr(self.lhs, "worker", None)
+        if worker is not None:
+            worker.shutdown()
+            worker.wait(2000)
+        box_thread = getattr(self.lhs, "box_thread", None)
+        if box_thread is not None:
+            box_thread.stop()
+            box_thread.wait(2000)
+        QCoreApplication.instance().quit()
+
+
+def serve(fd):
+    app = QCoreApplication(sys.argv[:1])
+    server = BackendServer(Connection(fd))
+    QTimer.singleShot(0, server.start)
+    return app.exec_()
+
+
+# ============================ GUI Side ==================================
+class BackendProcess(QObject):
+    """GUI-side proxy for the backend process; LHSFunction calls go over IPC and never block."""
+
+    state_changed = pyqtSignal(dict)
+    batch_finished = pyqtSignal(dict)
+    deck_changed = pyqtSignal(int, list, bool)  # status_code, missing_boxes, run paused for it
+    aborted = pyqtSignal(dict)  # CommandQueueWorker.last_abort
+    backend_lost = pyqtSignal()
+
+    def __init__(self, auto_restart=True):
+        super().__init__()
+        self.auto_restart = auto_restart
+        self.process = None
+        self.conn = None
+        self.notifier = None
+        self.next_call = 1
+        self.pending = {}  # call id -> on_result(ok, value)
+        self.batch_callbacks = {}  # batch id -> [callback(info)]
+        self.finished_batches = {}  # batch id -> info, when it ended before anyone asked
+        self.state = self._initial_state()
+
+    def _initial_state(self):
+        state = {key: None for key in STATE_KEYS}
+        state["connected"] = False
+        state["busy"] = False
+        return state
+
+    def startup_status(self):
+        # "connecting", "ready in 2.31 s", ... for the screen
+        serial_state = self.state.get("serial_state") or "starting"
+        if self.state.get("connect_time") is not None and serial_state == "ready":
+            return f"{serial_state} in {self.state['connect_time']:.2f} s"
+        return serial_state
+
+    # LHSFunction-style attributes, so existing screen code reads them unchanged
+    @property
+    def home_done(self):
+        return bool(self.state.get("home_done"))
+
+    @property
+    def IsStartupSend(self):
+        return bool(self.state.get("IsStartupSend"))
+
+    def start(self):
+        # Call once the QApplication exists (main.py does, at startup)
+        if self.process is not None and self.process.poll() is None:
+            return
+        if QCoreApplication.instance() is None:
+            print("[Backend] No QApplication yet, backend not started")
+            return
+        parent_sock, child_sock = socket.socketpair()
+        child_fd = child_sock.detach()
+        self.process = subprocess.Popen(
+            [sys.executable, "-m", "calibration.Machine_Code.backend_process", "--fd", str(child_fd)],
+            pass_fds=(child_fd,),
+        )
+        os.close(child_fd)
+        self.conn = Connection(parent_sock.detach())
+        self.notifier = QSocketNotifier(self.conn.fileno(), QSocketNotifier.Read, self)
+        self.notifier.activated.connect(self._read_messages)
+        print(f"[Backend] Started backend process {self.process.pid}")
+
+    def stop(self):
+        self.auto_restart = False
+        self._close()
+        if self.process is not None:
+            try:
+                self.process.wait(5)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+            self.process = None
+
+    def restart(self):
+        # Drop the backend (and its serial port / camera) and start a fresh one
+        auto_restart = self.auto_restart
+        self.stop()
+        self.auto_restart = auto_restart
+        self.start()
+
+    def _close(self):
+        if self.notifier is not None:
+            self.notifier.setEnabled(False)
+            self.notifier = None
+        if self.conn is not None:
+            self.conn.close()
+            self.conn = None
+        for on_result in self.pending.values():
+            if on_result:
+                self._run_callback(on_result, False, "Backend stopped")
+        self.pending.clear()
+        # A new backend starts from scratch (not homed, no startup values)
+        self.state = self._initial_state()
+
+# ============================ Calls ==================================
+    def call(self, method, *args, on_result=None, **kwargs):
+        # Fire and forget; on_result(ok, value) runs on the GUI thread when the answer comes
+        if self.conn is None:
+            self.start()
+        if self.conn is None:
+            print(f"[Backend] Not running, {method} dropped")
+            if on_result:
+                on_result(False, "Backend not running")
+            return None
+        call_id = self.next_call
+        self.next_call += 1
+        self.pending[call_id] = on_result
+        try:
+            self.conn.send(("call", call_id, method, args, kwargs))
+        except (OSError, BrokenPipeError) as e:
+            self.pending.pop(call_id, None)
+            print(f"[Backend] Call {method} not sent: {e}")
+            if on_result:
+                on_result(False, str(e))
+        return call_id
+
+    def __getattr__(self, name):
+        if name in BACKEND_API:
+            return lambda *args, **kwargs: self.call(name, *args, **kwargs)
+        raise AttributeError(name)
+
+    def on_batch_done(self, batch_id, callback):
+        # callback(info) once the backend reports the batch finished
+        if batch_id in self.finished_batches:
+            callback(self.finished_batches.pop(batch_id))
+            return
+        self.batch_callbacks.setdefault(batch_id, []).append(callback)
+
+# ============================ Telemetry ==================================
+    def _read_messages(self):
+        try:
+            while self.conn is not None and self.conn.poll():
+                self._dispatch(self.conn.recv())
+        except (EOFError, OSError):
+            self._lost()
+
+    def _dispatch(self, message):
+        if message[0] == "result":
+            _, call_id, ok, value = message
+            on_result = self.pending.pop(call_id, None)
+            if not ok:
+                print(f"[Backend] Call failed: {value}")
+            if on_result:
+                self._run_callback(on_result, ok, value)
+            return
+
+        _, name, data = message
+        if name == "state":
+            self.state.update(data)
+            self.state_changed.emit(dict(self.state))
+        elif name == "batch":
+            callbacks = self.batch_callbacks.pop(data["id"], None)
+            if callbacks is None:
+                self.finished_batches[data["id"]] = data
+                if len(self.finished_batches) > 256:
+                    self.finished_batches.pop(next(iter(self.finished_batches)))
+            for callback in callbacks or ():
+                self._run_callback(callback, data)
+            self.batch_finished.emit(data)
+        elif name == "deck":
+            self.deck_changed.emit(data["status"], data["missing"], data["paused"])
+        elif name == "abort":
+            self.aborted.emit(data)
+
+    def _run_callback(self, callback, *args):
+        # An exception escaping a Qt slot would take the whole GUI down
+        try:
+            callback(*args)
+        except Exception as e:
+            print(f"[Backend] Callback failed: {e}")
+
+    def _lost(self):
+        print("[Backend] Backend process exited")
+        self._close()
+        self.backend_lost.emit()
+        if self.auto_restart:
+            QTimer.singleShot(1000, self.start)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Liquid handler hardware backend process")
+    parser.add_argument("--fd", type=int, required=True, help="socket inherited from the GUI")
+    args = parser.parse_args()
+    sys.exit(serve(args.fd))
@@ -0,0 +1,137 @@
+import time
+import threading
+
+from PyQt5.QtCore import QObject, QCoreApplication, pyqtSignal, pyqtSlot
+
+
+# Batch states
+PENDING = "pending"
+RUNNING = "running"
+OK = "ok"                # every command answered OK;
+ERROR = "error"          # ran to the end, the firmware rejected at least one command
+CANCELLED = "cancelled"  # cancel() before or during the run, the rest was not sent
+ABORTED = "aborted"      # stop / emergency, in-flight answers were abandoned
+
+FINAL_STATES = (OK, ERROR, CANCELLED, ABORTED)
+
+
+class BatchHandle(QObject):
+    """Future for one enqueued batch: progress, cancel, status and timing, completed once on the GUI thread."""
+
+    finished = pyqtSignal(object)  # the handle, on the GUI thread
+    progress = pyqtSignal(int, int)  # acked, total (-1 while a lazy batch is still being generated)
+    _deliver = pyqtSignal()
+
+    def __init__(self, total=None, lane=None):
+        super().__init__()
+        app = QCoreApplication.instance()
+        self.deliver_in_thread = app is None  # no Qt loop, complete on the worker thread
+        if app is not None and self.thread() is not app.thread():
+            self.moveToThread(app.thread())
+        self._deliver.connect(self._run_callbacks)
+
+        self.lane = lane
+        self.replace_key = None  # set by CommandQueueWorker.enqueue(replace=...)
+        self.total = total
+        self.status = PENDING
+        self.sent = 0
+        self.acked = 0
+        self.errors = []  # (command text, response text)
+        self.interrupted_at = None  # index of the command an abort cut off
+        self.journal_factory = None  # () -> started RunJournal, called when the batch starts
+        self.journal = None  # RunJournal the worker records acks to
+        self.queued_at = time.monotonic()
+        self.started_at = None
+        self.finished_at = None
+
+        self._lock = threading.Lock()
+        self._done = threading.Event()
+        self._cancel_requested = False
+        self._callbacks = []
+        self._delivered = False
+
+# ============================ Caller Side ==================================
+    def cancel(self):
+        # Pending batches are skipped, a running one stops at the next command
+        with self._lock:
+            if self.status in FINAL_STATES:
+                return False
+            self._cancel_requested = True
+            return True
+
+    def cancel_requested(self):
+        return self._cancel_requested
+
+    def done(self):
+        return self._done.is_set()
+
+    def cancelled(self):
+        return self.status == CANCELLED
+
+    def result(self, timeout=None):
+        # Final status; blocks, so not for the GUI thread while the batch is running
+        if not self._done.wait(timeout):
+            raise TimeoutError("Batch still running")
+        return self.status
+
+    def add_done_callback(self, callback):
+        # callback(handle), exactly once, on the GUI thread
+        with self._lock:
+            if not self._delivered:
+                self._callbacks.append(callback)
+                return
+        callback(self)
+
+    def timing(self):
+        now = time.monotonic()
+        started = self.started_at
+        return {
+            "queued_ms": round(((started or self.finished_at or now) - self.queued_at) * 1000, 1),
+            "run_ms": round(((self.finished_at or now) - started) * 1000, 1) if started else 0.0,
+        }
+
+    def __repr__(self):
+        return f"<BatchHandle {self.status} {self.acked}/{self.total if self.total is not None else '?'}>"
+
+# ============================ Worker Side ==================================
+    def _start(self):
+        self.status = RUNNING
+        self.started_at = time.monotonic()
+
+    def _command_sent(self):
+        self.sent += 1
+
+    def _command_acked(self, command, response, is_error):
+        self.acked += 1
+        if is_error:
+            self.errors.append((command, response))
+        self.progress.emit(self.acked, self.total if self.total is not None else -1)
+
+    def _finish(self, status):
+        with self._lock:
+            if self.status in FINAL_STATES:
+                return
+            if status == OK and self.errors:
+                status = ERROR
+            self.status = status
+            self.finished_at = time.monotonic()
+        self._done.set()
+        if self.deliver_in_thread:
+            self._run_callbacks()
+        else:
+            self._deliver.emit()
+
+    @pyqtSlot()
+    def _run_callbacks(self):
+        with self._lock:
+            if self._delivered:
+                return
+            self._delivered = True
+            callbacks = self._callbacks
+            self._callbacks = []
+        for callback in callbacks:
+            try:
+                callback(self)
+            except Exception as e:
+                print(f"[BatchHandle] Callback failed: {e}")
+        self.finished.emit(self)
@@ -0,0 +1,98 @@
+import os
+import cv2
+import glob
+import time
+import argparse
+import numpy as np
+from skimage.metrics import structural_similarity as compare_ssim # type: ignore
+
+from .box_detector_v2 import BoxDetector
+from .camera_capture import get_capture_service
+
+
+# Compares the staged detector (_check_box) with the old full SSIM path
+# (legacy_is_box_present) on recorded deck frames: latency and how often they agree.
+#
+#   python -m calibration.Machine_Code.box_detection_benchmark frames/ --record 50
+#   python -m calibration.Machine_Code.box_detection_benchmark frames/
+
+
+def record_frames(frame_dir, count, interval=0.5, camera_index=0):
+    os.makedirs(frame_dir, exist_ok=True)
+    capture = get_capture_service(camera_index)
+    for i in range(count):
+        _, frame = capture.latest(max_age=1.0)
+        cv2.imwrite(os.path.join(frame_dir, f"frame_{i:04d}.png"), frame)
+        time.sleep(interval)
+    capture.stop()
+    print(f"[Benchmark] Recorded {count} frames to {frame_dir}")
+
+
+def legacy_is_box_present(detector, current_roi, reference_roi, threshold):
+    # The detector's check before the prefilter: CLAHE both ROIs, full SSIM
+    gray_cur = detector._preprocess(cv2.cvtColor(current_roi, cv2.COLOR_BGR2GRAY))
+    gray_ref = detector._preprocess(cv2.cvtColor(reference_roi, cv2.COLOR_BGR2GRAY))
+    gray_cur = cv2.resize(gray_cur, (gray_ref.shape[1], gray_ref.shape[0]))
+    score, _ = compare_ssim(gray_cur, gray_ref, full=True)
+    return score > threshold, score
+
+
+def run_benchmark(frame_dir, ref_path):
+    paths = sorted(glob.glob(os.path.join(frame_dir, "*.png")) + glob.glob(os.path.join(frame_dir, "*.jpg")))
+    if not paths:
+        raise FileNotFoundError(f"No recorded frames in {frame_dir}")
+
+    detector = BoxDetector(ref_path=ref_path)
+    legacy_times = []
+    staged_times = []
+    agree = 0
+    total = 0
+    stages = {"prefilter": 0, "ssim": 0}
+    disagreements = []
+
+    for path in paths:
+        frame = cv2.imread(path)
+        if frame is None:
+            continue
+        for name, (x, y, w, h) in detector.blocks.items():
+            roi = frame[y:y+h, x:x+w]
+
+            start = time.perf_counter()
+            legacy_present, _ = legacy_is_box_present(detector, roi, detector.reference_rois[name], detector.thresholds[name])
+            legacy_times.append(time.perf_counter() - start)
+
+            start = time.perf_counter()
+            present, _, stage = detector._check_box(name, roi)
+            staged_times.append(time.perf_counter() - start)
+
+            stages[stage] += 1
+            total += 1
+            if present == legacy_present:
+                agree += 1
+            else:
+                disagreements.append((os.path.basename(path), name, legacy_present, present, stage))
+
+    def summary(times):
+        ms = np.asarray(times) * 1000
+        return f"mean {ms.mean():.2f} ms  p50 {np.percentile(ms, 50):.2f} ms  p95 {np.percentile(ms, 95):.2f} ms"
+
+    print(f"[Benchmark] {len(paths)} frames, {total} ROI checks")
+    print(f"  current (SSIM)   : {summary(legacy_times)}")
+    print(f"  staged           : {summary(staged_times)}")
+    print(f"  speed up         : {np.mean(legacy_times) / np.mean(staged_times):.1f}x")
+    print(f"  settled by stage : {stages}")
+    print(f"  agreement        : {agree}/{total} ({100.0 * agree / total:.1f}%)")
+    for item in disagreements:
+        print(f"    differs: {item}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Box detection latency / agreement benchmark")
+    parser.add_argument("frame_dir", help="directory of recorded deck frames (.png/.jpg)")
+    parser.add_argument("--ref", default="/home/pi/Automatic_Pipeting_Machine/reference_images/All.png")
+    parser.add_argument("--record", type=int, default=0, help="record this many frames first")
+    args = parser.parse_args()
+
+    if args.record:
+        record_frames(args.frame_dir, args.record)
+    run_benchmark(args.frame_dir, args.ref)
@@ -1,30 +1,123 @@
 from PyQt5.QtCore import QThread, pyqtSignal
 from .box_detector_v2 import BoxDetector
+import cv2
 import time
+import threading
 
 class BoxDetectionThread(QThread):
     detection_result = pyqtSignal(int, list)  # status_code, missing_boxes
+    deck_changed = pyqtSignal(int, list)  # status_code, missing_boxes (while monitoring)
 
-    def __init__(self, parent=None, interval=1):
+    def __init__(self, parent=None, interval=1, monitor_fps=1.0, cpu_budget=0.15):
         super().__init__(parent)
         self.detector = BoxDetector()
         self._running = True
         self.interval = interval  # seconds between retries
 
+        # Monitoring during a run
+        self._monitoring = False
+        self._wake = threading.Event()  # cuts the pause between monitor checks short
+        self._monitor_requested = threading.Event()  # wakes the idle thread for a run
+        self.monitor_fps = monitor_fps
+        self.cpu_budget = cpu_budget  # max share of one core this thread may use
+        self.change_threshold = 6.0  # mean abs gray difference on the 80x45 thumbnail
+        self.confirm_checks = 3  # full checks that must agree before deck_changed fires
+
     def run(self):
-        if self._running: # while 
-            status, missing, _ = self.detector.detect_once()
-            self.detection_result.emit(status, missing)
+        if self._running and not self._monitoring: # while
+            try:
+                status, missing, _ = self.detector.detect_once()
+                self.detection_result.emit(status, missing)
+            except RuntimeError as e:
+                # No camera must not take the backend process down with it
+                print(f"[Detection] {e}")
             # if status == 5:
             #     break
             time.sleep(self.interval)
+        # The thread stays alive between runs, so start_monitoring() never has
+        # to restart it (and can't miss one that is just returning)
+        while self._running:
+            if self._monitoring:
+                self._monitor_loop()
+                continue
+            # Nothing reads frames until the next run, free the camera and USB
+            self.detector.pause_camera()
+            self._monitor_requested.wait()
+            self._monitor_requested.clear()
 
     def stop(self):
         self._running = False
+        self.stop_monitoring()
+        self._monitor_requested.set()
 
     def show_screen(self):
         self.detector.detect_once(True)
 
+# ============================ Monitoring ==================================
+    def start_monitoring(self):
+        self._monitoring = True
+        self._wake.clear()
+        self._monitor_requested.set()
+        if not self.isRunning() and self._running:
+            self.start(QThread.LowestPriority)
+
+    def stop_monitoring(self):
+        self._monitoring = False
+        self._wake.set()
+
+    def _thumbnail(self, frame):
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        return cv2.resize(gray, (80, 45), interpolation=cv2.INTER_AREA)
+
+    def _monitor_loop(self):
+        period = 1.0 / self.monitor_fps
+        # Nothing needs more frames than the monitor samples during a run
+        self.detector.set_frame_rate(self.monitor_fps)
+        try:
+            self._monitor_checks(period)
+        finally:
+            self.detector.set_frame_rate(None)
+
+    def _monitor_checks(self, period):
+        baseline = None  # thumbnail the last full check ran on
+        reported = None  # missing boxes at the start of the run / last report
+        candidate = None
+        seen = 0
+
+        while self._running and self._monitoring:
+            started = time.monotonic()
+            cpu_start = time.thread_time()
+            try:
+                _, frame = self.detector.latest_frame(max_age=period + 1.0)
+                thumbnail = self._thumbnail(frame)
+
+                # Full comparison only when something in view actually changed
+                if baseline is None or cv2.absdiff(thumbnail, baseline).mean() > self.change_threshold or candidate is not None:
+                    status, missing, _ = self.detector.detect_frame(frame)
+                    baseline = thumbnail
+                    if reported is None:
+                        reported = missing
+                    elif missing != reported:
+                        # The moving head can hide a box for a moment, wait for it to persist
+                        seen = seen + 1 if missing == candidate else 1
+                        candidate = missing
+                        if seen >= self.confirm_checks:
+                            print(f"[Monitor] Deck changed, missing: {missing}")
+                            self.deck_changed.emit(status, missing)
+                            reported = missing
+                            candidate = None
+                            seen = 0
+                    else:
+                        candidate = None
+                        seen = 0
+            except RuntimeError as e:
+                print(f"[Monitor] {e}")
+
+            # Keep to the CPU budget: an expensive check stretches the next pause
+            cpu_used = time.thread_time() - cpu_start
+            pause = max(period - (time.monotonic() - started), cpu_used / self.cpu_budget - cpu_used)
+            self._wake.wait(pause)
+
 
 # detection = BoxDetectionThread()
-# detection.show_screen()
\ No newline at end of file
+# detection.show_screen()
@@ -4,9 +4,11 @@ import os
 from skimage.metrics import structural_similarity as compare_ssim # type: ignore
 import time
 
+from .camera_capture import get_capture_service
+
 
 class BoxDetector:
-    def __init__(self, camera_index=0, ref_path="/home/pi/Automatic_Pipeting_Machine/reference_images/All.png"):
+    def __init__(self, camera_index=0, ref_path="/home/pi/Automatic_Pipeting_Machine/reference_images/All.png", capture=None):
         self.blocks = {
              "Tip Box": (25, 45, 200, 120),
         "Reagent Box": (10, 235, 200, 100),
@@ -22,19 +24,54 @@ class BoxDetector:
         self.ref_path = ref_path
         self.camera_index = camera_index
         self.reference_rois = {}
-        self.cap = None
+        self.reference_features = {}
+        # Cheap first stage: histogram (Bhattacharyya) distance and mean abs
+        # difference on the 1/4 scale image. Only the cases in between go to SSIM.
+        self.prefilter = {
+            "present_hist": 0.05,
+            "present_diff": 4.0,
+            "absent_hist": 0.5,
+            "absent_diff": 60.0,
+        }
+        self.pyramid_levels = 2
+        self.last_stages = {}
+        self.capture = capture  # CameraCaptureService, shared one is used when None
         self._load_reference_image()
 
     def _preprocess(self, gray_img):
         clahe = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8, 8))
         return clahe.apply(gray_img)
 
-    def _is_box_present(self, current_roi, reference_roi, threshold):
-        gray_cur = self._preprocess(cv2.cvtColor(current_roi, cv2.COLOR_BGR2GRAY))
-        gray_ref = self._preprocess(cv2.cvtColor(reference_roi, cv2.COLOR_BGR2GRAY))
-        gray_cur = cv2.resize(gray_cur, (gray_ref.shape[1], gray_ref.shape[0]))
-        score, _ = compare_ssim(gray_cur, gray_ref, full=True)
-        return score > threshold, score
+    def _features(self, roi, size=None):
+        # gray + CLAHE, its downscaled pyramid and the histogram of the smallest level
+        gray = self._preprocess(cv2.cvtColor(roi, cv2.COLOR_BGR2GRAY))
+        if size is not None and gray.shape != size:
+            gray = cv2.resize(gray, (size[1], size[0]))
+        pyramid = [gray]
+        for _ in range(self.pyramid_levels):
+            pyramid.append(cv2.pyrDown(pyramid[-1]))
+        small = pyramid[-1]
+        hist = cv2.calcHist([small], [0], None, [32], [0, 256])
+        cv2.normalize(hist, hist)
+        return {"gray": gray, "pyramid": pyramid, "small": small, "hist": hist}
+
+    def _check_box(self, name, current_roi):
+        # Staged check against the precomputed reference. Returns (present, score, stage);
+        # score is the SSIM when it ran, otherwise 1 - histogram distance.
+        reference = self.reference_features[name]
+        threshold = self.thresholds[name]
+        current = self._features(current_roi, reference["gray"].shape)
+
+        hist_distance = cv2.compareHist(current["hist"], reference["hist"], cv2.HISTCMP_BHATTACHARYYA)
+        diff = float(cv2.absdiff(current["small"], reference["small"]).mean())
+        limits = self.prefilter
+        if hist_distance < limits["present_hist"] and diff < limits["present_diff"]:
+            return True, 1.0 - hist_distance, "prefilter"
+        if hist_distance > limits["absent_hist"] or diff > limits["absent_diff"]:
+            return False, 1.0 - hist_distance, "prefilter"
+
+        score = compare_ssim(current["gray"], reference["gray"])
+        return score > threshold, score, "ssim"
 
     def _load_reference_image(self):
         if not os.path.exists(self.ref_path):
@@ -44,34 +81,46 @@ class BoxDetector:
             raise IOError("Failed to read reference image.")
         for name, (x, y, w, h) in self.blocks.items():
             self.reference_rois[name] = full_reference[y:y+h, x:x+w]
+            self.reference_features[name] = self._features(self.reference_rois[name])
     
     def save_img_before_use():
         return 0
 
     
 
-    def detect_once(self, show_feed=False):
-        self.cap = cv2.VideoCapture(self.camera_index)
-        self.cap.set(cv2.CAP_PROP_FRAME_WIDTH, 640)
-        self.cap.set(cv2.CAP_PROP_FRAME_HEIGHT, 360)
+    def _get_capture(self):
+        if self.capture is None:
+            self.capture = get_capture_service(self.camera_index)
+        return self.capture
+
+    def pause_camera(self):
+        if self.capture is not None:
+            self.capture.pause()
 
-        if not self.cap.isOpened():
-            raise RuntimeError("Could not open camera.")
-        
-        for _ in range(5):
-            self.cap.read()
-            time.sleep(0.3)
+    def set_frame_rate(self, fps=None):
+        # Frames per second the capture thread reads, None for full rate
+        self._get_capture().set_rate(fps)
 
-        ret, frame = self.cap.read()
-        if not ret:
-            raise RuntimeError("Failed to grab frame.")
+    def latest_frame(self, max_age=None):
+        # (timestamp, frame) from the capture thread, wakes a paused camera
+        return self._get_capture().latest(max_age=max_age)
+
+    def detect_once(self, show_feed=False):
+        # Newest frame from the capture thread (max 1 s old), camera stays open
+        _, frame = self.latest_frame(max_age=1.0)
+        return self.detect_frame(frame, show_feed)
+
+    def detect_frame(self, frame, show_feed=False):
+        if show_feed:
+            frame = frame.copy()  # the buffered frame is shared, don't draw on it
 
         missing_boxes = []
         results = {}
 
         for name, (x, y, w, h) in self.blocks.items():
             roi = frame[y:y+h, x:x+w]
-            present, score = self._is_box_present(roi, self.reference_rois[name], self.thresholds[name])
+            present, score, stage = self._check_box(name, roi)
+            self.last_stages[name] = stage
             results[name] = (present, score)
             if not present:
                 missing_boxes.append(name)
@@ -87,7 +136,6 @@ class BoxDetector:
             cv2.waitKey(1000)
             cv2.destroyAllWindows()
 
-        self.cap.release()
         all_present = len(missing_boxes) == 0
         return 5 if all_present else len(missing_boxes), missing_boxes, results
 
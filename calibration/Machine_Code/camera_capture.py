@@ -0,0 +1,151 @@
+import cv2
+import time
+import threading
+from collections import deque
+
+
+class CameraCaptureService(threading.Thread):
+    """Keeps the deck camera open and the newest frames in a small ring buffer."""
+
+    def __init__(self, camera_index=0, width=640, height=360, buffer_size=4, idle_timeout=30.0, warmup_frames=5):
+        super().__init__(daemon=True)
+        self.camera_index = camera_index
+        self.width = width
+        self.height = height
+        self.idle_timeout = idle_timeout  # seconds without a reader before the camera is released
+        self.warmup_frames = warmup_frames
+        self.max_fps = None  # None reads at the camera's own rate
+
+        self.frames = deque(maxlen=buffer_size)  # (monotonic timestamp, frame)
+        self.condition = threading.Condition()
+        self.cap = None
+        self.paused = False
+        self.running = True
+        self.last_request = time.monotonic()
+        self.error = None
+
+# ============================ Camera ==================================
+    def _open(self):
+        self.cap = cv2.VideoCapture(self.camera_index)
+        self.cap.set(cv2.CAP_PROP_FRAME_WIDTH, self.width)
+        self.cap.set(cv2.CAP_PROP_FRAME_HEIGHT, self.height)
+        self.cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+        if not self.cap.isOpened():
+            self.cap.release()
+            self.cap = None
+            raise RuntimeError("Could not open camera.")
+        # Let auto exposure settle, frames are read back to back instead of sleeping
+        for _ in range(self.warmup_frames):
+            self.cap.read()
+
+    def _release(self):
+        if self.cap is not None:
+            self.cap.release()
+            self.cap = None
+        with self.condition:
+            self.frames.clear()
+
+    def run(self):
+        while self.running:
+            with self.condition:
+                if not self.paused and time.monotonic() - self.last_request > self.idle_timeout:
+                    print("[Camera] Idle, releasing camera")
+                    self.paused = True
+                paused = self.paused
+            if paused:
+                # Closing the device is what actually frees the USB bandwidth
+                self._release()
+                with self.condition:
+                    while self.paused and self.running:
+                        self.condition.wait()
+                continue
+
+            try:
+                if self.cap is None:
+                    self._open()
+                    self.error = None
+                ret, frame = self.cap.read()
+                if not ret:
+                    raise RuntimeError("Failed to grab frame.")
+            except RuntimeError as e:
+                if str(e) != str(self.error):
+                    print(f"[Camera] {e}")
+                self.error = e
+                self._release()
+                with self.condition:
+                    self.condition.notify_all()
+                time.sleep(1.0)
+                continue
+
+            with self.condition:
+                self.frames.append((time.monotonic(), frame))
+                self.condition.notify_all()
+                # Throttled (deck monitoring): sleep out the rest of the frame
+                # period, set_rate()/pause()/stop() cut the wait short
+                if self.max_fps and not self.paused and self.running:
+                    self.condition.wait(1.0 / self.max_fps)
+
+        self._release()
+
+# ============================ Control ==================================
+    def pause(self):
+        with self.condition:
+            self.paused = True
+            self.condition.notify_all()
+
+    def resume(self):
+        with self.condition:
+            self.last_request = time.monotonic()
+            self.paused = False
+            self.condition.notify_all()
+
+    def set_rate(self, fps=None):
+        # Cap the read loop at fps frames per second, None for full rate
+        with self.condition:
+            self.max_fps = fps
+            self.condition.notify_all()
+
+    def stop(self):
+        with self.condition:
+            self.running = False
+            self.condition.notify_all()
+
+# ============================ Frames ==================================
+    def latest(self, timeout=5.0, max_age=None):
+        # Newest (timestamp, frame). Wakes the camera if it was paused and waits
+        # for a frame no older than max_age seconds.
+        deadline = time.monotonic() + timeout
+        with self.condition:
+            self.last_request = time.monotonic()
+            if self.paused:
+                self.paused = False
+                self.condition.notify_all()
+            while True:
+                if self.frames:
+                    stamp, frame = self.frames[-1]
+                    if max_age is None or time.monotonic() - stamp <= max_age:
+                        return stamp, frame
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise RuntimeError(f"No camera frame available ({self.error or 'timeout'}).")
+                self.condition.wait(remaining)
+
+    def snapshot(self):
+        # Copy of the buffered (timestamp, frame) pairs, oldest first
+        with self.condition:
+            return list(self.frames)
+
+
+_services = {}
+_services_lock = threading.Lock()
+
+
+def get_capture_service(camera_index=0):
+    # One capture thread per camera for the whole process
+    with _services_lock:
+        service = _services.get(camera_index)
+        if service is None or not service.is_alive():
+            service = CameraCaptureService(camera_index)
+            service.start()
+            _services[camera_index] = service
+        return service
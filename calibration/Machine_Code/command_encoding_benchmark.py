@@ -0,0 +1,63 @@
+import time
+import argparse
+import tracemalloc
+
+from .gcode_command import gcode_commands
+
+
+# Cost of turning queued G-code into wire bytes, per N commands: the old
+# strip().encode() on every send against the shared GcodeCommand objects.
+#
+#   python -m calibration.Machine_Code.command_encoding_benchmark --count 10000
+
+# Mix of what serial_Dilution sends over and over
+HOT_COMMANDS = ["G0Z80;", "G0Z160;", "G0Z162;", "G0Z176.5;", "E0;", "G0A0;", "G0A50;", "G0A100;",
+                "G0X149.2Y15.4;", "G0X158.2Y15.4;", "G0X167.2Y15.4;", "G0X9.2Y44.8;"]
+
+
+def workload(count):
+    return [HOT_COMMANDS[i % len(HOT_COMMANDS)] for i in range(count)]
+
+
+def send_strings(command_list):
+    # What _send did before: strip per use, encode per send, keep it in flight
+    in_flight = []
+    for command in command_list:
+        data = command.strip().encode('Ascii')
+        in_flight.append((command.strip(), len(data), data))
+    return in_flight
+
+
+def send_commands(command_list):
+    in_flight = []
+    for command in gcode_commands(command_list):
+        in_flight.append((command, len(command.data), command.data))
+    return in_flight
+
+
+def measure(send, command_list):
+    send(command_list)  # warm up (fills the intern table for the new path)
+    tracemalloc.start()
+    start = time.perf_counter()
+    in_flight = send(command_list)
+    elapsed = time.perf_counter() - start
+    retained, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    distinct = len({id(data) for _, _, data in in_flight})
+    return {
+        "bytes_objects": distinct,
+        "retained_kb": round(retained / 1024, 1),
+        "peak_kb": round(peak / 1024, 1),
+        "us_per_command": round(elapsed * 1e6 / len(command_list), 3),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Command encoding allocation benchmark")
+    parser.add_argument("--count", type=int, default=10000)
+    args = parser.parse_args()
+
+    command_list = workload(args.count)
+    print(f"[Benchmark] {args.count} commands")
+    print(f"  strip().encode() : {measure(send_strings, command_list)}")
+    print(f"  GcodeCommand     : {measure(send_commands, command_list)}")
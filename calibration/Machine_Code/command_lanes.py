@@ -0,0 +1,6 @@
+# Queue lanes, lower number always goes first. Kept apart from the backend so
+# the GUI process can use them without importing serial / OpenCV.
+# Stop / feed-hold has no lane: abort() writes it to the port past the queue.
+INTERACTIVE = 0  # jog, home, manual buttons, config
+BULK = 1         # protocol runs
+LANES = (INTERACTIVE, BULK)
@@ -0,0 +1,161 @@
+import glob
+import time
+import threading
+
+import serial
+from PyQt5.QtCore import QThread, pyqtSignal
+
+from .serial_transport import ResponseParser, OK, POSITION
+
+
+# Connection states
+CONNECTING = "connecting"
+READY = "ready"
+FAILED = "failed"
+DISCONNECTED = "disconnected"
+
+HANDSHAKE = b"D5;"
+
+# Feed hold probe: firmware with feed hold answers "!" with a position report.
+# The ';' behind it ends the line on firmware without, so the "!" is not
+# left in front of the next command.
+FEED_HOLD_PROBE = b"!;"
+FEED_HOLD_TIMEOUT = 0.3
+
+
+def probe_feed_hold(port, timeout=FEED_HOLD_TIMEOUT):
+    # True if the controller stops on the halt byte (answers with POS:...;)
+    read_timeout, port.timeout = port.timeout, 0.05
+    try:
+        port.reset_input_buffer()
+        port.write(FEED_HOLD_PROBE)
+        parser = ResponseParser()
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            data = port.read(max(1, port.in_waiting))
+            if any(response.kind == POSITION for response in parser.feed(data)):
+                return True
+        return False
+    finally:
+        # Whatever else it answered (ER:1; for an unknown "!") is not for the worker
+        time.sleep(0.05)
+        port.reset_input_buffer()
+        port.timeout = read_timeout
+
+
+class SerialConnectionManager(QThread):
+    """Finds the controller in the background: scans ports, handshakes with D5;, reconnects after an unplug."""
+
+    state_changed = pyqtSignal(str, str)  # state, port or reason
+    ready = pyqtSignal(object, float, bool)  # open serial.Serial, seconds from connect request to first OK;, feed hold
+
+    def __init__(self, preferred_port=None, baudrate=115200, handshake_timeout=5.0, retry_interval=2.0, parent=None):
+        super().__init__(parent)
+        self.preferred_port = preferred_port
+        self.baudrate = baudrate
+        self.handshake_timeout = handshake_timeout  # Arduino reboots on open, the bootloader takes ~1.5 s
+        self.retry_interval = retry_interval
+        self.state = DISCONNECTED
+        self.port = None
+        self.connect_time = None
+        self.feed_hold = False  # probed on every connect
+        self._running = True
+        self._request = threading.Event()
+        self._requested_at = None
+
+    def candidate_ports(self):
+        ports = []
+        if self.preferred_port:
+            ports.append(self.preferred_port)
+        try:
+            from serial.tools import list_ports
+            found = [info.device for info in list_ports.comports()]
+        except ImportError:
+            found = glob.glob("/dev/ttyUSB*") + glob.glob("/dev/ttyACM*")
+        for device in sorted(found):
+            if ("ttyUSB" in device or "ttyACM" in device) and device not in ports:
+                ports.append(device)
+        return ports
+
+# ============================ Control ==================================
+    def connect_async(self):
+        if self._requested_at is None:
+            self._requested_at = time.monotonic()
+        self._request.set()
+        if not self.isRunning():
+            self.start()
+
+    def link_lost(self, reason=""):
+        # Called when the open port stops working (USB unplugged, reader died)
+        self.port = None
+        self._set_state(DISCONNECTED, reason)
+        self.connect_async()
+
+    def stop(self):
+        self._running = False
+        self._request.set()
+
+    def _set_state(self, state, detail=""):
+        self.state = state
+        print(f"[Serial] {state} {detail}".rstrip())
+        self.state_changed.emit(state, detail)
+
+# ============================ Scan / Handshake ==================================
+    def run(self):
+        while self._running:
+            self._request.wait()
+            if not self._running:
+                break
+            self._request.clear()
+
+            while self._running and self.port is None:
+                for device in self.candidate_ports():
+                    self._set_state(CONNECTING, device)
+                    port = self._open(device)
+                    if port is not None:
+                        self.port = port
+                        break
+                if self.port is not None:
+                    self.connect_time = time.monotonic() - self._requested_at
+                    self._requested_at = None
+                    self._set_state(READY, f"{self.port.port} in {self.connect_time:.2f} s")
+                    self.ready.emit(self.port, self.connect_time, self.feed_hold)
+                    break
+                self._set_state(FAILED, "no controller answered")
+                self._request.wait(self.retry_interval)
+                self._request.clear()
+
+    def _open(self, device):
+        try:
+            port = serial.Serial(device, self.baudrate, timeout=0.05, write_timeout=1.0)
+        except (serial.SerialException, OSError, ValueError) as e:
+            print(f"[Serial] {device}: {e}")
+            return None
+        try:
+            if self._handshake(port):
+                self.feed_hold = probe_feed_hold(port)
+                print(f"[Serial] {device}: feed hold {'supported' if self.feed_hold else 'not supported'}")
+                port.timeout = None  # the worker's reader blocks instead of polling
+                return port
+            print(f"[Serial] {device}: no answer to {HANDSHAKE.decode()}")
+        except (serial.SerialException, OSError) as e:
+            print(f"[Serial] {device}: {e}")
+        port.close()
+        return None
+
+    def _handshake(self, port):
+        # One D5; at a time until it is answered, so no stray OK; is left for the worker
+        port.reset_input_buffer()
+        parser = ResponseParser()
+        deadline = time.monotonic() + self.handshake_timeout
+        while self._running and time.monotonic() < deadline:
+            port.write(HANDSHAKE)
+            answer_by = min(deadline, time.monotonic() + 0.25)
+            while time.monotonic() < answer_by:
+                data = port.read(max(1, port.in_waiting))
+                if any(response.kind == OK for response in parser.feed(data)):
+                    # Let anything else the boot printed arrive, then drop it
+                    time.sleep(0.05)
+                    port.reset_input_buffer()
+                    return True
+        return False
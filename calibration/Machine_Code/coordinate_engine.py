@@ -0,0 +1,49 @@
+import re
+import numpy as np
+
+
+# Well count -> (rows, cols) for SBS footprint plates
+LABWARE_FORMATS = {
+    6: (2, 3),
+    24: (4, 6),
+    96: (8, 12),
+    384: (16, 24),
+    1536: (32, 48),
+}
+
+
+def labware_format(labware):
+    # labwares.json entry ({"details": [{"label": "Wells", "value": "96"}, ...]}) or a well count
+    if isinstance(labware, int):
+        count = labware
+    else:
+        count = None
+        for detail in labware.get("details", []):
+            if detail.get("label") in ("Wells", "Grid"):
+                match = re.search(r"\d+", str(detail.get("value", "")))
+                if match:
+                    count = int(match.group())
+                    break
+    if count not in LABWARE_FORMATS:
+        raise ValueError(f"Unsupported labware format: {count}")
+    return LABWARE_FORMATS[count]
+
+
+def plate_grid(a1, a_last, h1, h_last, rows, cols):
+    # Bilinear map of the four measured corner wells onto a rows x cols grid.
+    # Returns a (rows, cols, 2) array of X/Y in mm.
+    corners = np.asarray([a1, a_last, h1, h_last], dtype=float)
+    u = np.linspace(0.0, 1.0, cols) if cols > 1 else np.zeros(1)
+    v = np.linspace(0.0, 1.0, rows) if rows > 1 else np.zeros(1)
+    u = u[None, :, None]
+    v = v[:, None, None]
+    return ((1 - u) * (1 - v) * corners[0]
+            + u * (1 - v) * corners[1]
+            + (1 - u) * v * corners[2]
+            + u * v * corners[3])
+
+
+def render_moves(grid):
+    # Row-major "G0X..Y..;" strings, rounded the same way the firmware always got them
+    points = np.abs(np.round(np.asarray(grid, dtype=float).reshape(-1, 2), 2)).tolist()
+    return [f"G0X{x}Y{y};" for x, y in points]
@@ -0,0 +1,45 @@
+# start_up_values.json prefix per C-command, in the order the firmware always got them
+CONFIG_GROUPS = (
+    ("C1", "SPMMS"),
+    ("C2", "MAX_FEED"),
+    ("C3", "MAX_ACCELS"),
+    ("C4", "MAX_TRAVELS"),
+    ("C5", "OFFSETS"),
+    ("C6", "HOMING_FEED"),
+)
+AXES = ("X", "Y", "Z", "A")
+
+
+def config_commands(data):
+    # [(key, value, "C1X40.25;"), ...] for the 24 parameters in start_up_values.json
+    entries = []
+    for code, name in CONFIG_GROUPS:
+        for axis in AXES:
+            key = f"{name}_{axis}"
+            entries.append((key, data[key], f"{code}{axis}{data[key]};"))
+    return entries
+
+
+class FirmwareConfigShadow():
+    """What the controller currently holds for C1-C6, so reconfiguring sends only changes."""
+
+    def __init__(self):
+        self.applied = {}  # key -> value the controller acknowledged
+
+    def invalidate(self):
+        # Opening the port resets the Arduino, everything has to go again
+        self.applied.clear()
+
+    def diff(self, data):
+        return [entry for entry in config_commands(data) if self.applied.get(entry[0]) != entry[1]]
+
+    def mark_applied(self, entries, handle):
+        # Record what the batch actually set. Acks come back in order, so the
+        # first handle.acked entries were answered; rejected or unanswered
+        # values stay unknown and go again next time.
+        failed = {command for command, _ in handle.errors}
+        for index, (key, value, command) in enumerate(entries):
+            if index < handle.acked and command not in failed:
+                self.applied[key] = value
+            else:
+                self.applied.pop(key, None)
@@ -0,0 +1,281 @@
+import os
+import pty
+import tty
+import json
+import math
+import time
+import queue
+import select
+import threading
+
+
+# Config command -> start_up_values.json key prefix
+CONFIG_KEYS = {
+    "C1": "SPMMS",
+    "C2": "MAX_FEED",
+    "C3": "MAX_ACCELS",
+    "C4": "MAX_TRAVELS",
+    "C5": "OFFSETS",
+    "C6": "HOMING_FEED",
+}
+
+# H0..H3 home one axis each (home_clicked sends H3, H2, H1, H0)
+HOME_AXES = {"H0": "X", "H1": "Y", "H2": "Z", "H3": "A"}
+
+AXES = ("X", "Y", "Z", "A")
+
+EJECT_TIME = 0.8  # seconds the ejector takes
+
+# Out-of-band feed hold: stop now, drop everything buffered, answer with a
+# position report ("POS:X..Y..Z..A..;") and no OK; for what was dropped
+HALT = b"!"
+
+
+def move_time(distance, max_feed, max_accel):
+    # Trapezoidal profile: accelerate, cruise, decelerate (triangular if too short)
+    distance = abs(distance)
+    if distance == 0:
+        return 0.0
+    if max_feed <= 0:
+        return 0.0
+    if max_accel <= 0:
+        return distance / max_feed
+    ramp_distance = (max_feed * max_feed) / max_accel
+    if distance >= ramp_distance:
+        return distance / max_feed + max_feed / max_accel
+    return 2 * math.sqrt(distance / max_accel)
+
+
+class FirmwareSimulator():
+    """Fake controller on a pseudo-terminal speaking the Arduino G-code dialect."""
+
+    def __init__(self, time_scale=1.0, config_path="calibration/Machine_Code/start_up_values.json"):
+        # time_scale 1.0 = real time, 0.1 = ten times faster, 0 = instant
+        self.time_scale = time_scale
+        self.config = {}
+        if os.path.exists(config_path):
+            with open(config_path, "r") as f:
+                data = json.load(f)
+            for prefix in CONFIG_KEYS.values():
+                for axis in AXES:
+                    key = f"{prefix}_{axis}"
+                    if key in data:
+                        self.config[key] = float(data[key])
+
+        self.position = {axis: 0.0 for axis in AXES}
+        self.master_fd = None
+        self.slave_fd = None
+        self.port_name = None
+        self.commands = queue.Queue()
+        self.halt = threading.Event()
+        self.running = False
+        self.reset_stats()
+
+    def reset_stats(self):
+        self.stats = {
+            "received": 0,
+            "ok": 0,
+            "errors": 0,
+            "motion_time": 0.0,
+            "max_backlog": 0,
+            "halts": 0,
+            "halted_at": None,  # time.monotonic() the last halt brought motion to rest
+        }
+
+# ============================ Lifecycle ==================================
+    def start(self):
+        self.master_fd, self.slave_fd = pty.openpty()
+        tty.setraw(self.slave_fd)
+        self.port_name = os.ttyname(self.slave_fd)
+        self.running = True
+
+        self.reader = threading.Thread(target=self._read_loop, daemon=True)
+        self.executor = threading.Thread(target=self._execute_loop, daemon=True)
+        self.reader.start()
+        self.executor.start()
+        print(f"[Simulator] Listening on {self.port_name}")
+        return self.port_name
+
+    def stop(self):
+        self.running = False
+        self.commands.put(None)
+        for fd in (self.master_fd, self.slave_fd):
+            if fd is not None:
+                try:
+                    os.close(fd)
+                except OSError:
+                    pass
+        self.master_fd = None
+        self.slave_fd = None
+
+# ============================ Serial Side ==================================
+    def _read_loop(self):
+        pending = b""
+        while self.running:
+            try:
+                ready, _, _ = select.select([self.master_fd], [], [], 0.2)
+                if not ready:
+                    continue
+                data = os.read(self.master_fd, 1024)
+            except (OSError, TypeError):
+                break
+            if not data:
+                continue
+
+            while HALT in data:
+                before, _, data = data.partition(HALT)
+                self._queue_commands(pending + before)
+                pending = b""  # half a command before a halt is dropped with the rest
+                self._halt()
+            pending = self._queue_commands(pending + data)
+
+    def _queue_commands(self, pending):
+        # Queues every complete command in `pending`, returns the unfinished rest
+        while b";" in pending:
+            command, pending = pending.split(b";", 1)
+            command = command.strip().decode("Ascii", errors="replace")
+            if not command:
+                continue
+            self.stats["received"] += 1
+            self.commands.put(command)
+            self.stats["max_backlog"] = max(self.stats["max_backlog"], self.commands.qsize())
+        return pending
+
+    def _halt(self):
+        self.halt.set()
+        try:
+            while True:
+                self.commands.get_nowait()
+        except queue.Empty:
+            pass
+        self.commands.put(HALT)  # the executor answers once the current move is stopped
+
+    def _reply(self, text):
+        if self.master_fd is None:
+            return
+        try:
+            os.write(self.master_fd, text.encode("Ascii"))
+        except OSError:
+            pass
+
+    def _execute_loop(self):
+        still = True  # no move was cut short since the last halt answer
+        while self.running:
+            command = self.commands.get()
+            if command is None:
+                break
+            if command == HALT:
+                self.halt.clear()
+                self.stats["halts"] += 1
+                if still:
+                    self.stats["halted_at"] = time.monotonic()
+                still = True
+                report = "".join(f"{axis}{self.position[axis]:.2f}" for axis in AXES)
+                self._reply(f"POS:{report};")
+                continue
+            start = dict(self.position)
+            duration = self.execute(command)
+            if duration is None:
+                self.stats["errors"] += 1
+                self._reply("ER:1;")
+                continue
+            self.stats["motion_time"] += duration
+            if duration > 0 and self.time_scale > 0:
+                started = time.monotonic()
+                if self.halt.wait(duration * self.time_scale):
+                    # Stopped part way: the head rests between start and target
+                    done = min(1.0, (time.monotonic() - started) / (duration * self.time_scale))
+                    for axis in AXES:
+                        self.position[axis] = start[axis] + (self.position[axis] - start[axis]) * done
+                    self.stats["halted_at"] = time.monotonic()
+                    still = False
+                    continue
+            self.stats["ok"] += 1
+            self._reply("OK;")
+
+# ============================ Dialect ==================================
+    def _parse_words(self, text):
+        # "X10.5Y3Z80" -> {"X": 10.5, "Y": 3.0, "Z": 80.0}
+        words = {}
+        letter = None
+        number = ""
+        for ch in text:
+            if ch.isalpha():
+                if letter is not None:
+                    words[letter] = float(number)
+                letter = ch.upper()
+                number = ""
+            else:
+                number += ch
+        if letter is not None:
+            words[letter] = float(number)
+        return words
+
+    def execute(self, command):
+        # Returns modeled duration in seconds, or None if the firmware would answer ER:1;
+        try:
+            code = command[:2].upper()
+            if code == "G0":
+                return self._move(self._parse_words(command[2:]))
+            if code in HOME_AXES:
+                return self._home(HOME_AXES[code])
+            if code == "E0":
+                return EJECT_TIME
+            if code == "D5":
+                return 0.0
+            if code in CONFIG_KEYS:
+                words = self._parse_words(command[2:])
+                for axis, value in words.items():
+                    if axis not in AXES:
+                        return None
+                    self.config[f"{CONFIG_KEYS[code]}_{axis}"] = value
+                return 0.0
+        except ValueError:
+            return None
+        return None
+
+    def _move(self, words):
+        feed_cap = words.pop("F", None)
+        # Every axis is checked before any moves: an ER:1; move goes nowhere
+        for axis, target in words.items():
+            if axis not in AXES:
+                return None
+            # A negative OFFSETS value (the jog screen's lower limit) lets the
+            # axis below home; a positive one does not cut the range short
+            low = min(0.0, self.config.get(f"OFFSETS_{axis}", 0.0))
+            limit = self.config.get(f"MAX_TRAVELS_{axis}")
+            if target < low or (limit is not None and target > limit):
+                return None
+        duration = 0.0
+        for axis, target in words.items():
+            feed = self.config.get(f"MAX_FEED_{axis}", 0.0)
+            if feed_cap:
+                feed = min(feed, feed_cap)
+            accel = self.config.get(f"MAX_ACCELS_{axis}", 0.0)
+            duration = max(duration, move_time(target - self.position[axis], feed, accel))
+            self.position[axis] = target
+        return duration
+
+    def _home(self, axis):
+        feed = self.config.get(f"HOMING_FEED_{axis}", 0.0)
+        distance = abs(self.position[axis])
+        self.position[axis] = 0.0
+        return distance / feed if feed > 0 else 0.0
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Simulated liquid handler controller on a pty")
+    parser.add_argument("--time-scale", type=float, default=1.0, help="1.0 real time, 0 instant")
+    args = parser.parse_args()
+
+    simulator = FirmwareSimulator(time_scale=args.time_scale)
+    port = simulator.start()
+    print(f"Run the GUI with LHS_SERIAL_PORT={port}")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        simulator.stop()
+        print(f"[Simulator] {simulator.stats}")
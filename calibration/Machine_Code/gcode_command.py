@@ -0,0 +1,64 @@
+import re
+import sys
+import threading
+
+
+MOVE_WORD = re.compile(r"([XYZA])(-?\d+(?:\.\d+)?)")
+
+# Distinct command texts kept interned. Deck / well / config commands repeat all
+# run long; past this, one-off commands (manual jogs) are built but not kept.
+INTERN_LIMIT = 4096
+
+
+class GcodeCommand():
+    """One command parsed and encoded once: text, wire bytes, code and target words."""
+
+    __slots__ = ("text", "data", "code", "axes")
+
+    def __init__(self, text):
+        self.text = sys.intern(text.strip())
+        self.data = self.text.encode("Ascii")
+        self.code = self.text[:2].upper()
+        # ((axis, value), ...) for G0 moves, empty for everything else
+        self.axes = tuple((axis, float(value)) for axis, value in MOVE_WORD.findall(self.text)) if self.code == "G0" else ()
+
+    def __len__(self):
+        return len(self.data)
+
+    def __eq__(self, other):
+        if isinstance(other, GcodeCommand):
+            return self.data == other.data
+        return NotImplemented
+
+    def __hash__(self):
+        return hash(self.data)
+
+    def __repr__(self):
+        return f"GcodeCommand({self.text!r})"
+
+    def __str__(self):
+        return self.text
+
+
+_commands = {}
+_commands_lock = threading.Lock()
+
+
+def gcode_command(command):
+    # Shared GcodeCommand for a command string; GcodeCommand objects pass through
+    if isinstance(command, GcodeCommand):
+        return command
+    cached = _commands.get(command)
+    if cached is not None:
+        return cached
+    # " G0Z80;\n" and "G0Z80;" share one object
+    cached = _commands.get(command.strip()) or GcodeCommand(command)
+    with _commands_lock:
+        if len(_commands) < INTERN_LIMIT:
+            cached = _commands.setdefault(cached.text, cached)
+            _commands[command] = cached
+    return cached
+
+
+def gcode_commands(command_list):
+    return [gcode_command(command) for command in command_list]
@@ -0,0 +1,142 @@
+import re
+import math
+
+
+AXES = ("X", "Y", "Z", "A")
+HOME_AXES = {"H0": "X", "H1": "Y", "H2": "Z", "H3": "A"}
+WORD = re.compile(r"([XYZAF])(-?\d+(?:\.\d+)?)")
+
+# Z grows downwards (Z80 = clear, Z176 = tip inserted). At or above this height
+# the tip is out of the labware, so XY/A moves can be combined freely. The
+# procedures travel at this height; the backend uses it too.
+SAFE_Z = 80
+
+
+class GcodeOptimizer():
+    """Peephole pass over a G-code list: drops no-op moves and merges safe travel moves."""
+
+    def __init__(self, start=None, safe_z=SAFE_Z):
+        # None = position unknown until homed or moved there
+        self.safe_z = safe_z
+        self.position = dict(start) if start else {axis: None for axis in AXES}
+        self._after_position = dict(self.position)
+        self.reset_report()
+
+    def reset_report(self):
+        self.commands_before = 0
+        self.commands_after = 0
+        self.travel_before = 0.0
+        self.travel_after = 0.0
+
+    def report(self):
+        return {
+            "commands_before": self.commands_before,
+            "commands_after": self.commands_after,
+            "commands_saved": self.commands_before - self.commands_after,
+            "travel_before_mm": round(self.travel_before, 2),
+            "travel_after_mm": round(self.travel_after, 2),
+            "travel_saved_mm": round(self.travel_before - self.travel_after, 2),
+        }
+
+# ============================ Parsing ==================================
+    def _split(self, command_list):
+        # Entries may hold more than one command ("G0X9.2Y44.8;G0Z176.5;")
+        for entry in command_list:
+            for command in entry.split(";"):
+                command = command.strip()
+                if command:
+                    yield command + ";"
+
+    def _parse_move(self, command):
+        # {"X": "10.5", ...} keeping the original number text, or None if not a plain G0
+        if command[:2].upper() != "G0":
+            return None
+        body = command[2:-1]
+        words = WORD.findall(body)
+        if "".join(letter + value for letter, value in words) != body:
+            return None
+        return dict(words)
+
+    def _format(self, words):
+        return "G0" + "".join(f"{axis}{words[axis]}" for axis in AXES + ("F",) if axis in words) + ";"
+
+# ============================ Position Model ==================================
+    def _travel(self, start, end):
+        # XYZ distance in mm, unknown axes count as no travel
+        total = 0.0
+        for axis in ("X", "Y", "Z"):
+            if start[axis] is not None and end[axis] is not None:
+                total += (end[axis] - start[axis]) ** 2
+        return math.sqrt(total)
+
+    def _apply(self, position, command, words):
+        after = dict(position)
+        if words is not None:
+            for axis in AXES:
+                if axis in words:
+                    after[axis] = float(words[axis])
+        elif command[:2].upper() in HOME_AXES:
+            after[HOME_AXES[command[:2].upper()]] = 0.0
+        elif command[:2].upper() == "E0":
+            after["A"] = None  # ejector moves the plunger
+        else:
+            # D5 and friends leave the head alone, C-commands may remap it
+            if command[:1].upper() == "C":
+                after = {axis: None for axis in AXES}
+        return after
+
+    def _is_safe_travel(self, position, words):
+        # Only X/Y/A, no feed override, and the tip is up at clearance height
+        if "F" in words or "Z" in words:
+            return False
+        return position["Z"] is not None and position["Z"] <= self.safe_z
+
+# ============================ Pass ==================================
+    def optimize(self, command_list):
+        return list(self.optimize_stream(command_list))
+
+    def optimize_stream(self, command_list):
+        # Same pass as optimize(), but lazy: each command is yielded as soon as
+        # nothing later can merge into it. command_list may be any iterable.
+        pending = None  # merged XY/A travel move not yet written
+
+        for command in self._split(command_list):
+            self.commands_before += 1
+            words = self._parse_move(command)
+            before = dict(self.position)
+            after = self._apply(before, command, words)
+            self.travel_before += self._travel(before, after)
+
+            if words is not None:
+                # Drop words that target where the axis already is
+                words = {axis: value for axis, value in words.items()
+                         if axis == "F" or before.get(axis) is None or float(value) != before[axis]}
+                if not any(axis in AXES for axis in words):
+                    continue
+
+                if self._is_safe_travel(before, words):
+                    if pending is None:
+                        pending = dict(words)
+                    else:
+                        # Later target wins, the intermediate waypoint is not needed
+                        pending.update(words)
+                    self.position = after
+                    continue
+
+            if pending is not None:
+                yield self._emit(self._format(pending))
+                pending = None
+            self.position = after
+            yield self._emit(self._format(words) if words is not None else command)
+
+        if pending is not None:
+            yield self._emit(self._format(pending))
+
+    def _emit(self, command):
+        # Re-walk the emitted commands so travel_after matches what will actually run
+        self.commands_after += 1
+        words = self._parse_move(command)
+        after = self._apply(self._after_position, command, words)
+        self.travel_after += self._travel(self._after_position, after)
+        self._after_position = after
+        return command
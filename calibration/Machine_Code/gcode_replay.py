@@ -0,0 +1,104 @@
+import os
+import re
+import mmap
+import time
+
+from .gcode_command import gcode_command
+from .protocol_artifact import CompiledProtocol
+
+
+COUNT_CHUNK = 1 << 20  # bytes per slice when counting commands
+
+# A command is a ';'-separated piece starting with a letter and a digit
+# ("G0X9.2", "E0", "H3"); '#' and '(' start a comment that runs to the end of
+# the line. Section titles in program.txt ("Single Tip Ejection ( Starts )")
+# are neither. COMMAND_START counts the same pieces commands() yields.
+COMMENT = re.compile(rb"[#(][^\n]*")
+COMMAND_START = re.compile(rb"(?:^|;)[^\S\n]*[A-Za-z][0-9]", re.MULTILINE)
+
+
+def _strip_comment(line):
+    for mark in (b"#", b"("):
+        cut = line.find(mark)
+        if cut >= 0:
+            line = line[:cut]
+    return line
+
+
+def _is_command(piece):
+    return piece[:1].isalpha() and piece[1:2].isdigit()
+
+
+class GcodeFile():
+    """A .gcode file read through mmap one line at a time, so its size does not matter."""
+
+    # A line may hold several commands ("G0X9.2;G0Z176.5;"), the last ';' and
+    # a trailing comment are optional ("G0X1;G0Y2", "G0X1; (clear)").
+
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, "rb")
+        size = os.fstat(self.file.fileno()).st_size
+        self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ) if size else b""
+
+    def __len__(self):
+        # Number of commands, counted a slice (cut at a line end) at a time
+        data = self.map
+        end = len(data)
+        total = 0
+        start = 0
+        while start < end:
+            stop = data.find(b"\n", min(start + COUNT_CHUNK, end) - 1)
+            stop = end if stop < 0 else stop + 1
+            chunk = COMMENT.sub(b"", data[start:stop])
+            total += len(COMMAND_START.findall(chunk))
+            start = stop
+        return total
+
+    def commands(self, start=0):
+        data = self.map
+        end = len(data)
+        position = 0
+        index = 0
+        while position < end:
+            newline = data.find(b"\n", position)
+            if newline < 0:
+                newline = end
+            line = _strip_comment(data[position:newline])  # one line copied, never the file
+            position = newline + 1
+            for command in line.split(b";"):
+                command = command.strip()
+                if not _is_command(command):
+                    continue
+                if index >= start:
+                    yield gcode_command(command.decode("Ascii", errors="replace") + ";")
+                index += 1
+
+    def close(self):
+        if isinstance(self.map, mmap.mmap):
+            self.map.close()
+        self.file.close()
+
+
+def open_replay(path):
+    # .lhsc compiled artifacts and plain G-code text both give len() and commands()
+    if path.endswith(".lhsc"):
+        return CompiledProtocol(path)
+    return GcodeFile(path)
+
+
+def replay_progress(handle):
+    # {"acked", "total", "percent", "rate", "eta_s"} from a running replay's BatchHandle
+    total = handle.total
+    acked = handle.acked
+    elapsed = (handle.finished_at or time.monotonic()) - handle.started_at if handle.started_at else 0.0
+    rate = acked / elapsed if elapsed > 0 else 0.0
+    remaining = max(0, total - acked) if total else None
+    return {
+        "status": handle.status,
+        "acked": acked,
+        "total": total,
+        "percent": round(100.0 * acked / total, 1) if total else None,
+        "rate": round(rate, 1),  # commands per second
+        "eta_s": round(remaining / rate, 1) if rate > 0 and remaining is not None else None,
+    }
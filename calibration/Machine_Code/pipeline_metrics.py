@@ -0,0 +1,187 @@
+import json
+import math
+import time
+
+
+# Latency stages recorded per acknowledged command
+#   queue       ready (enqueued / pulled from a lazy batch) -> written to the port
+#   first_byte  written -> first byte of its answer read
+#   ack         written -> answer parsed
+#   total       ready -> answer parsed
+STAGES = ("queue", "first_byte", "ack", "total")
+
+PERCENTILES = (50, 90, 99, 99.9)
+
+
+def command_kind(command):
+    # Histogram group of a GcodeCommand: "G0 XY", "G0 Z", "G0 A", "E0", "H*", "C*", or its code
+    code = command.code
+    if code == "G0":
+        axes = [axis for axis, _ in command.axes]
+        if "A" in axes:
+            return "G0 A"
+        if "X" in axes or "Y" in axes:
+            return "G0 XY"
+        return "G0 Z"
+    if code[:1] == "H":
+        return "H*"
+    if code[:1] == "C":
+        return "C*"
+    return code
+
+
+class LatencyHistogram():
+    """Log-linear (HDR style) histogram of microsecond latencies: ~3 % resolution, fixed size."""
+
+    SUB_BUCKETS = 32  # per power of two
+    MAX_US = 60_000_000
+
+    def __init__(self):
+        self.counts = [0] * (self._index(self.MAX_US) + 1)
+        self.count = 0
+        self.total = 0
+        self.min = None
+        self.max = 0
+
+    @classmethod
+    def _index(cls, us):
+        if us < 2 * cls.SUB_BUCKETS:
+            return us
+        shift = us.bit_length() - 6  # keep the top 6 bits: 32..63
+        return (shift + 1) * cls.SUB_BUCKETS + (us >> shift) - cls.SUB_BUCKETS
+
+    @classmethod
+    def _upper(cls, index):
+        # Largest value that falls in bucket `index`
+        if index < 2 * cls.SUB_BUCKETS:
+            return index
+        shift = index // cls.SUB_BUCKETS - 1
+        sub = index % cls.SUB_BUCKETS + cls.SUB_BUCKETS
+        return ((sub + 1) << shift) - 1
+
+    def record(self, seconds):
+        # Called per command on the worker thread, so kept to plain arithmetic
+        us = int(seconds * 1e6)
+        if us < 64:
+            index = us if us > 0 else 0
+            us = index
+        else:
+            if us > self.MAX_US:
+                us = self.MAX_US
+            shift = us.bit_length() - 6
+            index = (shift << 5) + (us >> shift)
+        self.counts[index] += 1
+        self.count += 1
+        self.total += us
+        if self.min is None or us < self.min:
+            self.min = us
+        if us > self.max:
+            self.max = us
+
+    def percentile(self, percent):
+        # Upper edge of the bucket holding the percentile, in microseconds
+        if not self.count:
+            return 0
+        target = max(1, math.ceil(self.count * percent / 100))
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= target:
+                return min(self._upper(index), self.max)
+        return self.max
+
+    def summary(self):
+        if not self.count:
+            return {"count": 0}
+        summary = {
+            "count": self.count,
+            "min_ms": round(self.min / 1000, 3),
+            "mean_ms": round(self.total / self.count / 1000, 3),
+            "max_ms": round(self.max / 1000, 3),
+        }
+        for percent in PERCENTILES:
+            summary[f"p{percent:g}_ms"] = round(self.percentile(percent) / 1000, 3)
+        return summary
+
+    def buckets(self):
+        # {upper edge us: count} for the non-empty buckets, for the dump
+        return {self._upper(index): count for index, count in enumerate(self.counts) if count}
+
+
+class PipelineMetrics():
+    """Per-command timings of the serial worker, grouped by command kind, plus rate and depth gauges."""
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.histograms = {}  # kind -> {stage: LatencyHistogram}
+        self.started_at = time.monotonic()
+        self.sent = 0
+        self.acked = 0
+        self.errors = 0
+        self.depth_total = 0
+        self.max_depth = 0
+        self.last_depth = 0
+        self._rate_at = self.started_at
+        self._rate_acked = 0
+
+    def _group(self, kind):
+        group = self.histograms.get(kind)
+        if group is None:
+            group = self.histograms[kind] = {stage: LatencyHistogram() for stage in STAGES}
+        return group
+
+# ============================ Worker Side ==================================
+    def command_sent(self, depth):
+        self.sent += 1
+        self.depth_total += depth
+        self.last_depth = depth
+        if depth > self.max_depth:
+            self.max_depth = depth
+
+    def command_acked(self, command, ready_at, sent_at, first_byte_at, acked_at, is_error):
+        group = self._group(command_kind(command))
+        if ready_at is None:
+            ready_at = sent_at
+        group["queue"].record(sent_at - ready_at)
+        if first_byte_at is not None:
+            group["first_byte"].record(first_byte_at - sent_at)
+        group["ack"].record(acked_at - sent_at)
+        group["total"].record(acked_at - ready_at)
+        self.acked += 1
+        if is_error:
+            self.errors += 1
+
+# ============================ Snapshot ==================================
+    def snapshot(self, in_flight=0, waiting=None):
+        # Plain dict (JSON / IPC safe). Rate "now" is since the previous snapshot.
+        now = time.monotonic()
+        elapsed = now - self.started_at
+        interval = now - self._rate_at
+        rate_now = (self.acked - self._rate_acked) / interval if interval > 0 else 0.0
+        self._rate_at = now
+        self._rate_acked = self.acked
+        return {
+            "uptime_s": round(elapsed, 1),
+            "sent": self.sent,
+            "acked": self.acked,
+            "errors": self.errors,
+            "commands_per_s": round(self.acked / elapsed, 1) if elapsed > 0 else 0.0,
+            "commands_per_s_now": round(rate_now, 1),
+            "in_flight": in_flight,
+            "avg_depth": round(self.depth_total / self.sent, 2) if self.sent else 0.0,
+            "max_depth": self.max_depth,
+            "waiting": waiting or {},
+            "latency": {kind: {stage: histogram.summary() for stage, histogram in group.items()}
+                        for kind, group in sorted(self.histograms.items())},
+        }
+
+    def dump(self, path, snapshot):
+        # Snapshot plus the raw bucket counts, so dumps can be merged / replotted
+        data = dict(snapshot)
+        data["buckets"] = {kind: {stage: histogram.buckets() for stage, histogram in group.items()}
+                           for kind, group in sorted(self.histograms.items())}
+        with open(path, "w") as f:
+            json.dump(data, f, indent=4)
+        return path
@@ -0,0 +1,145 @@
+import os
+import glob
+import mmap
+import struct
+import hashlib
+
+from .gcode_command import gcode_command
+
+
+ARTIFACT_DIR = "calibration/Machine_Code/compiled"
+KEEP_PER_PROCEDURE = 3  # older artifacts of the same procedure are deleted
+
+# File layout:
+#   header   magic, version, command count, sha256 key, size of the command bytes
+#   offsets  count + 1 little-endian uint32, command n is data[offsets[n]:offsets[n + 1]]
+#   data     the command bytes exactly as they go on the wire ("G0X10Y20;G0Z80;...")
+MAGIC = b"LHSCMP01"
+VERSION = 1
+HEADER = struct.Struct("<8sHHI32sI")
+HEADER_SIZE = 64
+OFFSET = struct.Struct("<I")
+
+
+def artifact_key(name, sources=(), files=(), options=()):
+    # sha256 over what the compiled stream depends on: the code that builds it,
+    # the calibration files it reads and the compile options
+    digest = hashlib.sha256()
+    digest.update(f"{VERSION}:{name}:{options!r}".encode("utf-8"))
+    for source in sources:
+        digest.update(b"\0source\0" + source.encode("utf-8"))
+    for path in files:
+        digest.update(b"\0file\0" + path.encode("utf-8") + b"\0")
+        try:
+            with open(path, "rb") as f:
+                digest.update(f.read())
+        except OSError:
+            digest.update(b"<missing>")
+    return digest.digest()
+
+
+def artifact_path(name, key, directory=ARTIFACT_DIR):
+    return os.path.join(directory, f"{name}-{key.hex()[:16]}.lhsc")
+
+
+class CompiledProtocol():
+    """Memory-mapped compiled protocol: commands are sliced out of the file, nothing is rebuilt."""
+
+    def __init__(self, path, key=None):
+        self.path = path
+        self.file = open(path, "rb")
+        try:
+            self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            self.file.close()
+            raise ValueError(f"{path}: empty artifact")
+        magic, version, _, count, stored_key, data_size = HEADER.unpack_from(self.map, 0)
+        self.count = count
+        self.offsets_at = HEADER_SIZE
+        self.data_at = HEADER_SIZE + (count + 1) * OFFSET.size
+        if magic != MAGIC or version != VERSION or self.data_at + data_size != len(self.map) \
+                or (key is not None and stored_key != key):
+            self.close()
+            raise ValueError(f"{path}: not a valid artifact for this key")
+        self.key = stored_key
+        self.view = memoryview(self.map)
+
+    def __len__(self):
+        return self.count
+
+    def command_bytes(self, index):
+        # Zero-copy slice of the wire bytes of command `index`
+        start = OFFSET.unpack_from(self.map, self.offsets_at + index * OFFSET.size)[0]
+        end = OFFSET.unpack_from(self.map, self.offsets_at + (index + 1) * OFFSET.size)[0]
+        return self.view[self.data_at + start:self.data_at + end]
+
+    def commands(self, start=0):
+        # Shared GcodeCommands from `start` on; repeated commands hit the intern table
+        for index in range(start, self.count):
+            yield gcode_command(str(self.command_bytes(index), "Ascii"))
+
+    def size(self):
+        return len(self.map)
+
+    def close(self):
+        if getattr(self, "view", None) is not None:
+            self.view.release()
+            self.view = None
+        if getattr(self, "map", None) is not None:
+            self.map.close()
+            self.map = None
+        self.file.close()
+
+
+def load_artifact(name, key, directory=ARTIFACT_DIR):
+    # CompiledProtocol for this key, or None if it has not been compiled yet
+    path = artifact_path(name, key, directory)
+    if not os.path.exists(path):
+        return None
+    try:
+        return CompiledProtocol(path, key)
+    except (OSError, ValueError, struct.error) as e:
+        print(f"[Artifact] Ignoring {path}: {e}")
+        return None
+
+
+def write_artifact(name, key, command_data, directory=ARTIFACT_DIR):
+    # command_data: the wire bytes of each command, in order. Written to a
+    # temporary file and renamed, so a half-written artifact is never loaded.
+    os.makedirs(directory, exist_ok=True)
+    path = artifact_path(name, key, directory)
+    offsets = [0]
+    for data in command_data:
+        offsets.append(offsets[-1] + len(data))
+    body = b"".join(command_data)
+    header = HEADER.pack(MAGIC, VERSION, 0, len(command_data), key, len(body)).ljust(HEADER_SIZE, b"\0")
+    temp_path = path + ".tmp"
+    with open(temp_path, "wb") as f:
+        f.write(header)
+        f.write(struct.pack(f"<{len(offsets)}I", *offsets))
+        f.write(body)
+    os.replace(temp_path, path)
+
+    # Keep only the newest few of this procedure (calibration changes make new keys)
+    older = sorted(glob.glob(os.path.join(directory, f"{name}-*.lhsc")), key=os.path.getmtime, reverse=True)
+    for stale in older[KEEP_PER_PROCEDURE:]:
+        try:
+            os.remove(stale)
+        except OSError:
+            pass
+    return path
+
+
+def recording_stream(name, key, commands, directory=ARTIFACT_DIR):
+    # Passes `commands` through as GcodeCommands and saves the artifact once the
+    # stream has been read to the end (a cancelled run leaves nothing behind)
+    command_data = []
+    for command in commands:
+        command = gcode_command(command)
+        command_data.append(command.data)
+        yield command
+    try:
+        path = write_artifact(name, key, command_data, directory)
+        print(f"[Artifact] Saved {len(command_data)} commands to {path}")
+    except OSError as e:
+        print(f"[Artifact] Not saved: {e}")
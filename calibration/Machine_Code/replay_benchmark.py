@@ -0,0 +1,101 @@
+import os
+import sys
+import time
+import serial
+import random
+import argparse
+import tempfile
+import tracemalloc
+
+from PyQt5.QtCore import QCoreApplication
+
+from .firmware_simulator import FirmwareSimulator
+from .Machine_Backend_V2 import CommandQueueWorker
+from .gcode_replay import GcodeFile, replay_progress
+
+
+# Memory and speed of the replay line splitter on a large generated .gcode
+# file, then a short replay through the worker against the pty simulator.
+#
+#   python -m calibration.Machine_Code.replay_benchmark --lines 2000000 --replay 20000
+
+
+def write_program(path, lines):
+    # Deck-like moves with section titles mixed in, like program.txt
+    rng = random.Random(1)
+    with open(path, "w") as f:
+        for i in range(lines):
+            if i % 50 == 0:
+                f.write("Single Tip Ejection Function ( Starts )\n")
+            elif i % 3 == 0:
+                f.write(f"G0X{rng.randint(10, 250)}.{rng.randint(0, 9)}Y{rng.randint(10, 200)}.{rng.randint(0, 9)};\n")
+            else:
+                f.write(f"G0Z{rng.choice((80, 100, 160, 162, 176.5))};\n")
+
+
+def measure_split(path):
+    # Timed without tracing, then once more under tracemalloc for the peak
+    source = GcodeFile(path)
+    start = time.perf_counter()
+    counted = len(source)
+    count_time = time.perf_counter() - start
+    start = time.perf_counter()
+    commands = 0
+    for _ in source.commands():
+        commands += 1
+    split_time = time.perf_counter() - start
+
+    tracemalloc.start()
+    for _ in source.commands():
+        pass
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    source.close()
+    return counted, commands, count_time, split_time, peak
+
+
+def measure_replay(path, window):
+    simulator = FirmwareSimulator(time_scale=0)
+    port = simulator.start()
+    worker = CommandQueueWorker(serial.Serial(port, 115200, timeout=None), window=window)
+    worker.start()
+    source = GcodeFile(path)
+    handle = worker.enqueue(source.commands(), total=len(source))
+    while True:
+        try:
+            handle.result(1.0)
+            break
+        except TimeoutError:
+            progress = replay_progress(handle)
+            print(f"[Benchmark] {progress['percent']} %  {progress['rate']} cmd/s  eta {progress['eta_s']} s")
+    progress = replay_progress(handle)
+    worker.shutdown()
+    worker.wait()
+    simulator.stop()
+    source.close()
+    return progress
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="G-code file replay benchmark")
+    parser.add_argument("--lines", type=int, default=2000000, help="lines in the split test file")
+    parser.add_argument("--replay", type=int, default=20000, help="lines replayed through the simulator (0 = skip)")
+    parser.add_argument("--window", type=int, default=4, help="commands in flight during the replay")
+    args = parser.parse_args()
+
+    app = QCoreApplication(sys.argv)
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "program.gcode")
+        write_program(path, args.lines)
+        size_mb = os.path.getsize(path) / 1e6
+        counted, commands, count_time, split_time, peak = measure_split(path)
+        print(f"[Benchmark] file            : {args.lines} lines, {size_mb:.1f} MB, {commands} commands ({counted} counted)")
+        print(f"[Benchmark] count           : {count_time * 1000:.1f} ms")
+        print(f"[Benchmark] split           : {split_time:.2f} s, {split_time * 1e6 / max(1, commands):.2f} us per command")
+        print(f"[Benchmark] peak traced mem : {peak / 1024:.1f} KB")
+
+        if args.replay:
+            write_program(path, args.replay)
+            progress = measure_replay(path, args.window)
+            print(f"[Benchmark] replay          : {progress['status']}, {progress['acked']}/{progress['total']} "
+                  f"at {progress['rate']} cmd/s")
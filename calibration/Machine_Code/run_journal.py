@@ -0,0 +1,216 @@
+import os
+import math
+import mmap
+import time
+import zlib
+import struct
+
+
+JOURNAL_PATH = "calibration/Machine_Code/run_journal.bin"
+
+# File layout: a 128 byte header, then fixed-size records appended in ack order.
+# The file is preallocated (zeros), so the first record with kind 0 or a bad
+# CRC marks the end of what was written before a crash.
+MAGIC = b"LHSJRNL1"
+VERSION = 1
+HEADER = struct.Struct("<8sHHIdI64s")  # magic, version, state, record size, started, capacity, procedure
+HEADER_SIZE = 128
+# kind, flags, tips used, command index, crc32 of the command, modeled X Y Z A (NaN = unknown)
+RECORD_BODY = struct.Struct("<BBHIIffff")
+RECORD = struct.Struct("<BBHIIffffI")  # body + crc32 of the body
+
+# Header states
+RUNNING = 1
+COMPLETE = 2
+ENDED = 3  # stopped / failed, resumable
+
+# Record kinds
+ACK = 1
+RESUME = 2  # index = first command of a resumed run
+END = 3     # flags = END_STATUS code
+
+# Record flags (ACK)
+REJECTED = 1  # answered ER
+SAFE = 2      # tip ejected: the run can start again right after this command
+
+END_STATUS = {"ok": 0, "error": 1, "cancelled": 2, "aborted": 3}
+
+FLUSH_EVERY = 32       # records between msyncs
+FLUSH_INTERVAL = 0.5   # seconds, whichever comes first
+INITIAL_RECORDS = 32768
+
+_running = set()  # journal files a RunJournal in this process is writing
+
+
+class RunJournal():
+    """Append-only, memory-mapped record of acked commands so an interrupted run can resume."""
+
+    def __init__(self, path=JOURNAL_PATH):
+        self.path = path
+        self.file = None
+        self.map = None
+        self.running = False  # this instance holds the file's RUNNING run
+        self.capacity = 0
+        self.count = 0
+        self.base = 0  # index of the first command of this (possibly resumed) batch
+        self.tips = 0
+        self.position = {axis: math.nan for axis in "XYZA"}
+        self.flushed = 0  # records already synced
+        self.flushed_at = time.monotonic()
+
+# ============================ Writing ==================================
+    def start(self, procedure, base=0, previous=None):
+        # New run (base 0), or a resumed one continuing the journal `previous` describes.
+        # ValueError while another run is writing the file, or when it no longer
+        # holds the run `previous` describes.
+        if os.path.abspath(self.path) in _running:
+            raise ValueError(f"{self.path} is in use by a running batch")
+        if previous is not None and base > 0:
+            self._open(create=False)
+            if HEADER.unpack_from(self.map, 0)[4] != previous["started"]:
+                self.close()
+                raise ValueError(f"{self.path} was started again since the run to resume")
+            self.count = previous["records"]
+            self.tips = previous["tips"]
+            self.base = base
+            self._append(RESUME, 0, base, 0)
+        else:
+            self._open(create=True)
+            self.count = 0
+            self.base = 0
+            HEADER.pack_into(self.map, 0, MAGIC, VERSION, RUNNING, RECORD.size, time.time(),
+                             self.capacity, procedure.encode("utf-8")[:64])
+        self._set_state(RUNNING)
+        self.flush()
+        _running.add(os.path.abspath(self.path))
+        self.running = True
+        return self
+
+    def command_acked(self, index, command, rejected):
+        # index is the command's position within the batch (handle.acked - 1)
+        flags = REJECTED if rejected else 0
+        code = command.code
+        if code == "G0":
+            for axis, value in command.axes:
+                self.position[axis] = value
+        elif code in ("H0", "H1", "H2", "H3"):
+            self.position["XYZA"[int(code[1])]] = 0.0
+        elif code == "E0":
+            self.position["A"] = math.nan
+            if not rejected:
+                self.tips += 1
+                flags |= SAFE
+        self._append(ACK, flags, self.base + index, zlib.crc32(command.data))
+        if flags & SAFE or self.count - self.flushed >= FLUSH_EVERY or \
+                time.monotonic() - self.flushed_at >= FLUSH_INTERVAL:
+            self.flush()
+
+    def finish(self, status):
+        if self.map is None:
+            return
+        self._append(END, END_STATUS.get(status, 3), 0, 0)
+        self._set_state(COMPLETE if status == "ok" else ENDED)
+        self.flush()
+        self.close()
+
+    def _append(self, kind, flags, index, command_crc):
+        if self.count >= self.capacity:
+            self._grow()
+        position = self.position
+        offset = HEADER_SIZE + self.count * RECORD.size
+        RECORD_BODY.pack_into(self.map, offset, kind, flags, self.tips, index, command_crc,
+                              position["X"], position["Y"], position["Z"], position["A"])
+        body = self.map[offset:offset + RECORD_BODY.size]
+        struct.pack_into("<I", self.map, offset + RECORD_BODY.size, zlib.crc32(body))
+        self.count += 1
+
+    def flush(self):
+        # msync only the pages touched since the last flush
+        if self.map is None:
+            return
+        start = (HEADER_SIZE + self.flushed * RECORD.size) // mmap.PAGESIZE * mmap.PAGESIZE
+        end = HEADER_SIZE + self.count * RECORD.size
+        self.map.flush(0, mmap.PAGESIZE)  # header
+        if end > start:
+            self.map.flush(start, end - start)
+        self.flushed = self.count
+        self.flushed_at = time.monotonic()
+
+    def close(self):
+        if self.running:
+            _running.discard(os.path.abspath(self.path))
+            self.running = False
+        if self.map is not None:
+            self.map.close()
+            self.map = None
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+    def _set_state(self, state):
+        struct.pack_into("<H", self.map, 10, state)
+
+    def _open(self, create):
+        self.close()
+        mode = "w+b" if create or not os.path.exists(self.path) else "r+b"
+        self.file = open(self.path, mode)
+        size = os.fstat(self.file.fileno()).st_size
+        if size < HEADER_SIZE + INITIAL_RECORDS * RECORD.size:
+            size = HEADER_SIZE + INITIAL_RECORDS * RECORD.size
+            self.file.truncate(size)
+        self.map = mmap.mmap(self.file.fileno(), size)
+        self.capacity = (size - HEADER_SIZE) // RECORD.size
+
+    def _grow(self):
+        self.flush()
+        size = HEADER_SIZE + self.capacity * 2 * RECORD.size
+        self.map.close()
+        self.file.truncate(size)
+        self.map = mmap.mmap(self.file.fileno(), size)
+        self.capacity = (size - HEADER_SIZE) // RECORD.size
+        struct.pack_into("<I", self.map, 24, self.capacity)
+
+
+# ============================ Reading ==================================
+def read_journal(path=JOURNAL_PATH):
+    # What the last run got through, or None if there is no usable journal:
+    # {"procedure", "state", "started", "records", "last_acked", "tips",
+    #  "position", "resume_at", "resume_crc"}
+    if not os.path.exists(path):
+        return None
+    with open(path, "rb") as f:
+        data = f.read()
+    if len(data) < HEADER_SIZE:
+        return None
+    magic, version, state, record_size, started, _, procedure = HEADER.unpack_from(data, 0)
+    if magic != MAGIC or version != VERSION or record_size != RECORD.size:
+        return None
+
+    info = {
+        "procedure": procedure.rstrip(b"\0").decode("utf-8", errors="replace"),
+        "state": {RUNNING: "interrupted", COMPLETE: "complete", ENDED: "ended"}.get(state, "unknown"),
+        "started": started,
+        "records": 0,
+        "last_acked": None,
+        "tips": 0,
+        "position": None,
+        "resume_at": 0,      # first command of the last tip cycle that did not finish
+        "resume_crc": None,  # crc32 of the command just before resume_at, to check the rebuilt stream
+    }
+    offset = HEADER_SIZE
+    while offset + RECORD.size <= len(data):
+        record = RECORD.unpack_from(data, offset)
+        if record[0] == 0 or zlib.crc32(data[offset:offset + RECORD_BODY.size]) != record[-1]:
+            break
+        kind, flags, tips, index, command_crc = record[:5]
+        info["records"] += 1
+        info["tips"] = tips
+        if kind == ACK:
+            info["last_acked"] = index
+            info["position"] = {axis: (None if math.isnan(value) else round(value, 3))
+                                for axis, value in zip("XYZA", record[5:9])}
+            if flags & SAFE:
+                info["resume_at"] = index + 1
+                info["resume_crc"] = command_crc
+        offset += RECORD.size
+    return info
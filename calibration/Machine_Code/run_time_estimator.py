@@ -0,0 +1,103 @@
+import os
+import re
+import json
+import numpy as np
+
+
+AXES = ("X", "Y", "Z", "A")
+HOME_AXES = {"H0": 0, "H1": 1, "H2": 2, "H3": 3}
+WORD = re.compile(r"([XYZAF])(-?\d+(?:\.\d+)?)")
+
+EJECT_TIME = 0.8         # seconds for E0
+COMMAND_OVERHEAD = 0.004  # serial round trip + parse per command
+
+
+class RunTimeEstimator():
+    """Predicts how long a G-code list takes on the machine, without sending it."""
+
+    def __init__(self, file_path="calibration/Machine_Code/start_up_values.json"):
+        data = {}
+        if os.path.exists(file_path):
+            with open(file_path, "r") as f:
+                data = json.load(f)
+
+        def axis_values(prefix, default):
+            return np.array([float(data.get(f"{prefix}_{axis}", default)) for axis in AXES])
+
+        self.spmm = axis_values("SPMMS", 0)
+        self.max_feed = axis_values("MAX_FEED", 0)
+        self.max_accel = axis_values("MAX_ACCELS", 0)
+        self.homing_feed = axis_values("HOMING_FEED", 0)
+
+    def _parse(self, command_list):
+        # One row per command: target per axis (NaN = axis not moved), feed cap, kind
+        n = len(command_list)
+        targets = np.full((n, 4), np.nan)
+        feed_cap = np.full(n, np.inf)
+        homing = np.zeros((n, 4), dtype=bool)
+        fixed = np.zeros(n)
+
+        for i, command in enumerate(command_list):
+            command = command.strip()
+            code = command[:2].upper()
+            if code == "G0":
+                for letter, value in WORD.findall(command[2:]):
+                    if letter == "F":
+                        feed_cap[i] = float(value)
+                    else:
+                        targets[i, AXES.index(letter)] = float(value)
+            elif code in HOME_AXES:
+                axis = HOME_AXES[code]
+                targets[i, axis] = 0.0
+                homing[i, axis] = True
+            elif code == "E0":
+                fixed[i] = EJECT_TIME
+        return targets, feed_cap, homing, fixed
+
+    def command_times(self, command_list, start=(0.0, 0.0, 0.0, 0.0)):
+        n = len(command_list)
+        if n == 0:
+            return np.zeros(0)
+        targets, feed_cap, homing, fixed = self._parse(command_list)
+
+        # Forward fill untouched axes so every row holds the absolute position
+        positions = np.vstack([np.asarray(start, dtype=float), targets])
+        moved = ~np.isnan(positions)
+        last = np.where(moved, np.arange(n + 1)[:, None], 0)
+        np.maximum.accumulate(last, axis=0, out=last)
+        positions = positions[last, np.arange(4)]
+
+        # Quantize to whole motor steps like the firmware does
+        with np.errstate(divide="ignore", invalid="ignore"):
+            stepped = np.where(self.spmm > 0, np.round(positions * self.spmm) / self.spmm, positions)
+        distance = np.abs(np.diff(stepped, axis=0))
+
+        feed = np.minimum(self.max_feed[None, :], feed_cap[:, None])
+        accel = np.broadcast_to(self.max_accel, distance.shape)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            ramp = feed * feed / accel
+            trapezoid = np.where(distance >= ramp, distance / feed + feed / accel, 2 * np.sqrt(distance / accel))
+            trapezoid = np.where(accel > 0, trapezoid, distance / feed)
+            home = distance / self.homing_feed[None, :]
+        axis_time = np.where(homing, home, trapezoid)
+        axis_time = np.where((distance > 0) & np.isfinite(axis_time), axis_time, 0.0)
+
+        # Axes move together, so a command takes as long as its slowest axis
+        return axis_time.max(axis=1) + fixed + COMMAND_OVERHEAD
+
+    def estimate(self, command_list, start=(0.0, 0.0, 0.0, 0.0)):
+        times = self.command_times(command_list, start)
+        return {"command_times": times, "total": float(times.sum())}
+
+    def estimate_steps(self, batches, start=(0.0, 0.0, 0.0, 0.0)):
+        # batches: list of command lists, as passed to enqueue_commands
+        flat = [command for batch in batches for command in batch]
+        times = self.command_times(flat, start)
+        bounds = np.cumsum([0] + [len(batch) for batch in batches])
+        elapsed = np.concatenate([[0.0], np.cumsum(times)])
+        step_times = elapsed[bounds[1:]] - elapsed[bounds[:-1]]
+        return {
+            "step_times": step_times.tolist(),
+            "command_times": times,
+            "total": float(times.sum()),
+        }
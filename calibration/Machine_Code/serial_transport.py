@@ -0,0 +1,176 @@
+import re
+import time
+import threading
+from collections import deque, namedtuple
+
+import serial
+
+
+# Response kinds
+OK = "ok"
+ERROR = "error"
+DEBUG = "debug"
+POSITION = "position"
+
+# kind, error code (ERROR only), text as received, {axis: value} (POSITION only),
+# monotonic time its first byte was read (only with SerialTransport.timestamps)
+Response = namedtuple("Response", "kind code text axes received_at", defaults=(None,))
+
+# The two answers that make up nearly all traffic are parsed once, here
+OK_RESPONSE = Response(OK, None, "OK;", None)
+KNOWN_RESPONSES = {
+    b"OK;": OK_RESPONSE,
+    b"ER:1;": Response(ERROR, 1, "ER:1;", None),
+}
+
+ERROR_CODE = re.compile(rb"^ER:(\d+);$")
+# Position report, "X10.5Y3Z80A0;" with an optional "POS:" in front
+POSITION_REPORT = re.compile(rb"^(?:POS:)?((?:[XYZA]-?\d+(?:\.\d+)?)+);$")
+AXIS_WORD = re.compile(rb"([XYZA])(-?\d+(?:\.\d+)?)")
+
+
+class ResponseParser():
+    """Splits the controller byte stream into typed responses, one decode per frame."""
+
+    def __init__(self):
+        self.buffer = bytearray()
+
+    def feed(self, data):
+        # Returns the responses completed by `data`, the rest stays buffered
+        self.buffer += data
+        responses = []
+        start = 0
+        end = self.buffer.find(b";")
+        while end >= 0:
+            self._parse_frame(bytes(self.buffer[start:end + 1]), responses)
+            start = end + 1
+            end = self.buffer.find(b";", start)
+        if start:
+            del self.buffer[:start]
+        return responses
+
+    def clear(self):
+        self.buffer.clear()
+
+    def _parse_frame(self, frame, responses):
+        frame = frame.strip()
+        response = KNOWN_RESPONSES.get(frame)
+        if response is not None:
+            responses.append(response)
+            return
+
+        # Debug prints end in a newline and run into the next answer
+        if b"\n" in frame:
+            text, _, frame = frame.rpartition(b"\n")
+            for line in text.splitlines():
+                line = line.strip()
+                if line:
+                    responses.append(Response(DEBUG, None, line.decode("Ascii", errors="replace"), None))
+            frame = frame.strip()
+            response = KNOWN_RESPONSES.get(frame)
+            if response is not None:
+                responses.append(response)
+                return
+        if frame == b";" or not frame:
+            return
+
+        text = frame.decode("Ascii", errors="replace")
+        match = ERROR_CODE.match(frame)
+        if match:
+            responses.append(Response(ERROR, int(match.group(1)), text, None))
+        elif frame[:5] == b"Error":
+            responses.append(Response(ERROR, None, text, None))
+        elif POSITION_REPORT.match(frame):
+            axes = {axis.decode("Ascii"): float(value) for axis, value in AXIS_WORD.findall(frame)}
+            responses.append(Response(POSITION, None, text, axes))
+        else:
+            responses.append(Response(DEBUG, None, text, None))
+
+
+class SerialTransport():
+    """Full duplex serial link: a reader thread parses responses while the caller writes."""
+
+    def __init__(self, port, on_response=None):
+        self.port = port
+        self.on_response = on_response  # called from the reader thread when responses arrive
+        self.parser = ResponseParser()
+        self.responses = deque()
+        self.write_lock = threading.Lock()  # the worker and abort() both write
+        self.timestamps = False  # stamp responses with received_at (pipeline metrics)
+        self._frame_started = None
+        self.error = None
+        self.running = False
+        self.reader = None
+
+    def start(self):
+        if self.reader is not None and self.reader.is_alive():
+            return
+        self.running = True
+        self.error = None
+        self.reader = threading.Thread(target=self._read_loop, name="SerialTransportRX", daemon=True)
+        self.reader.start()
+
+    def close(self):
+        self.running = False
+        cancel = getattr(self.port, "cancel_read", None)
+        if cancel is not None:
+            try:
+                cancel()
+            except Exception:
+                pass
+        if self.reader is not None and self.reader is not threading.current_thread():
+            self.reader.join(1.0)
+
+    @property
+    def alive(self):
+        return self.reader is not None and self.reader.is_alive()
+
+# ============================ TX ==================================
+    def write(self, data):
+        # `data` is already encoded, no flush: the next command can go out
+        # while the controller is still answering the last one
+        with self.write_lock:
+            self.port.write(data)
+
+# ============================ RX ==================================
+    def next_response(self):
+        # Oldest unread Response, or None
+        try:
+            return self.responses.popleft()
+        except IndexError:
+            return None
+
+    def clear(self):
+        self.responses.clear()
+        self.parser.clear()
+
+    def _read_loop(self):
+        while self.running:
+            try:
+                # Blocks for the first byte, then takes whatever else is already here
+                data = self.port.read(max(1, self.port.in_waiting))
+            except (serial.SerialException, OSError, TypeError, ValueError) as e:
+                if self.running:
+                    print(f"[Transport] Read failed: {e}")
+                    self.error = e
+                break
+            if not data:
+                continue
+            if self.timestamps:
+                now = time.monotonic()
+                started = self._frame_started if self.parser.buffer else now
+                responses = self.parser.feed(data)
+                # The first answer began in an earlier read if a partial frame was waiting
+                responses = [response._replace(received_at=started if index == 0 else now)
+                             for index, response in enumerate(responses)]
+                self._frame_started = now if self.parser.buffer else None
+            else:
+                responses = self.parser.feed(data)
+            if responses:
+                self.responses.extend(responses)
+                if self.on_response:
+                    self.on_response()
+
+        self.running = False
+        if self.on_response:
+            self.on_response()  # let the writer side notice the reader is gone
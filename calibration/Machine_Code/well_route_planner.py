@@ -0,0 +1,106 @@
+import re
+import numpy as np
+
+
+XY = re.compile(r"X(-?\d+(?:\.\d+)?)Y(-?\d+(?:\.\d+)?)")
+
+
+def xy_from_gcode(command):
+    # "G0X149.2Y15.4;" -> (149.2, 15.4)
+    match = XY.search(command)
+    if match is None:
+        raise ValueError(f"No XY target in {command!r}")
+    return float(match.group(1)), float(match.group(2))
+
+
+class WellRoutePlanner():
+    """Orders well visits to cut XY travel (nearest neighbour + 2-opt)."""
+
+    def __init__(self, max_passes=20):
+        self.max_passes = max_passes
+
+    def route_length(self, points, order, start=None, end=None):
+        path = [points[i] for i in order]
+        if start is not None:
+            path = [start] + path
+        if end is not None:
+            path = path + [end]
+        if len(path) < 2:
+            return 0.0
+        path = np.asarray(path, dtype=float)
+        return float(np.hypot(*np.diff(path, axis=0).T).sum())
+
+    def order(self, points, start=None, end=None, fixed=()):
+        # Indices into points in visiting order. Indices in `fixed` keep their
+        # position; only the runs between them are reordered.
+        fixed = sorted(set(fixed))
+        result = []
+        run_start = start
+        previous = 0
+        for anchor in fixed + [len(points)]:
+            run = list(range(previous, anchor))
+            run_end = points[anchor] if anchor < len(points) else end
+            result.extend(self._order_run(points, run, run_start, run_end))
+            if anchor < len(points):
+                result.append(anchor)
+                run_start = points[anchor]
+            previous = anchor + 1
+        return result
+
+# ============================ Heuristics ==================================
+    def _order_run(self, points, run, start, end):
+        if len(run) < 2:
+            return run
+
+        # Node 0 is the start anchor (or a dummy at distance 0), last node the end anchor
+        coords = np.asarray([points[i] for i in run], dtype=float)
+        nodes = np.vstack([coords[:1] if start is None else [start], coords])
+        dist = np.hypot(*(nodes[:, None, :] - nodes[None, :, :]).transpose(2, 0, 1))
+        if start is None:
+            dist[0, :] = 0.0
+            dist[:, 0] = 0.0
+        end_dist = None
+        if end is not None:
+            end_dist = np.hypot(*(nodes - np.asarray(end, dtype=float)).T)
+
+        tour = self._nearest_neighbour(dist)
+        tour = self._two_opt(tour, dist, end_dist)
+        return [run[node - 1] for node in tour[1:]]
+
+    def _nearest_neighbour(self, dist):
+        n = len(dist)
+        visited = np.zeros(n, dtype=bool)
+        visited[0] = True
+        tour = [0]
+        for _ in range(n - 1):
+            row = np.where(visited, np.inf, dist[tour[-1]])
+            nxt = int(np.argmin(row))
+            visited[nxt] = True
+            tour.append(nxt)
+        return tour
+
+    def _two_opt(self, tour, dist, end_dist):
+        # Open path, node 0 fixed. Reversing tour[i..j] swaps edges
+        # (i-1, i) + (j, j+1) for (i-1, j) + (i, j+1); past the last node the
+        # "edge" is the distance to the end anchor (0 if there is none).
+        tour = np.asarray(tour)
+        n = len(tour)
+        for _ in range(self.max_passes):
+            improved = False
+            for i in range(1, n - 1):
+                a = tour[i - 1]
+                b = tour[i]
+                js = np.arange(i + 1, n)
+                c = tour[js]
+                after = np.append(tour[i + 2:], -1)
+                tail_old = np.where(after >= 0, dist[c, after], 0.0 if end_dist is None else end_dist[c])
+                tail_new = np.where(after >= 0, dist[b, after], 0.0 if end_dist is None else end_dist[b])
+                delta = dist[a, c] + tail_new - dist[a, b] - tail_old
+                best = int(np.argmin(delta))
+                if delta[best] < -1e-9:
+                    j = js[best]
+                    tour[i:j + 1] = tour[i:j + 1][::-1].copy()
+                    improved = True
+            if not improved:
+                break
+        return tour.tolist()
@@ -0,0 +1,70 @@
+import sys
+import time
+import serial
+import argparse
+import statistics
+import threading
+
+from PyQt5.QtCore import Qt, QCoreApplication
+
+from .firmware_simulator import FirmwareSimulator
+from .Machine_Backend_V2 import CommandQueueWorker
+
+
+# Idle CPU and first-command latency of CommandQueueWorker against the pty simulator.
+#
+#   python -m calibration.Machine_Code.worker_wakeup_benchmark --idle 5 --runs 200
+
+
+def measure_idle_cpu(worker, seconds):
+    # CPU used by the whole process while the worker sits idle
+    time.sleep(0.5)
+    cpu_start = time.process_time()
+    wall_start = time.monotonic()
+    time.sleep(seconds)
+    cpu = time.process_time() - cpu_start
+    wall = time.monotonic() - wall_start
+    return 100.0 * cpu / wall
+
+
+def measure_first_command(worker, runs):
+    # enqueue() -> OK; for a single zero-length command on an idle worker
+    done = threading.Event()
+    worker.finished_batch_signal.connect(lambda _: done.set(), Qt.DirectConnection)
+    latencies = []
+    for _ in range(runs):
+        time.sleep(0.02)  # let the worker go back to sleep
+        done.clear()
+        start = time.perf_counter()
+        worker.enqueue(["D5;"])
+        if not done.wait(2.0):
+            raise RuntimeError("No answer from simulator")
+        latencies.append((time.perf_counter() - start) * 1000)
+    return latencies
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="CommandQueueWorker wake-up benchmark")
+    parser.add_argument("--idle", type=float, default=5.0, help="seconds of idle CPU measurement")
+    parser.add_argument("--runs", type=int, default=200, help="first-command samples")
+    args = parser.parse_args()
+
+    app = QCoreApplication(sys.argv)
+    simulator = FirmwareSimulator(time_scale=0)
+    port = simulator.start()
+    arduino = serial.Serial(port, 115200, timeout=None)
+    worker = CommandQueueWorker(arduino)
+    worker.start()
+
+    idle = measure_idle_cpu(worker, args.idle)
+    latencies = measure_first_command(worker, args.runs)
+    latencies.sort()
+
+    print(f"[Benchmark] idle CPU          : {idle:.2f} % of one core over {args.idle:.0f} s")
+    print(f"[Benchmark] first command p50 : {statistics.median(latencies):.3f} ms")
+    print(f"[Benchmark] first command p95 : {latencies[int(len(latencies) * 0.95) - 1]:.3f} ms")
+    print(f"[Benchmark] first command max : {latencies[-1]:.3f} ms")
+
+    worker.shutdown()
+    worker.wait()
+    simulator.stop()
@@ -190,6 +190,7 @@ class CalibrationScreen(QWidget):
         for i, name in enumerate(buttons):
             btn = self.make_button(name, 60, 60, rounded=True)
             btn.clicked.connect(partial(Triggers.functionality_buttons, name,self))
+            btn.setEnabled(name not in Triggers.UNAVAILABLE)
             center_grid.addWidget(btn, i%2, i//2, alignment=Qt.AlignCenter)
         center_grid.setSpacing(15)
         center_widget = QWidget()
@@ -275,6 +276,12 @@ class CalibrationScreen(QWidget):
         btn_right.clicked.connect(lambda: Triggers.btn_x_right(self,x_edit))
         z_down.clicked.connect(lambda:Triggers.btn_z_down(self,z_edit))
         z_up.clicked.connect(lambda:Triggers.btn_z_up(self,z_edit))
+        # Holding a button streams the move, releasing it stops the head
+        for button, edit, axis, direction in ((btn_up, y_edit, "Y", -1), (btn_down, y_edit, "Y", 1),
+                                              (btn_left, x_edit, "X", -1), (btn_right, x_edit, "X", 1),
+                                              (z_up, z_edit, "Z", -1), (z_down, z_edit, "Z", 1)):
+            button.pressed.connect(partial(Triggers.btn_jog_pressed, self, edit, axis, direction))
+            button.released.connect(Triggers.btn_jog_released)
         
         # Edit Connectors
         x_edit.textEdited.connect(lambda text: Triggers.x_label_edit(self,text,x_edit))
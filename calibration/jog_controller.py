@@ -0,0 +1,186 @@
+import json
+import os
+
+from PyQt5.QtCore import QObject, QTimer
+
+
+LIMITS_FILE = "calibration/Machine_Code/start_up_values.json"
+
+COALESCE_MS = 60      # taps closer together than this become one move
+HOLD_DELAY_MS = 300   # press longer than this and the button streams instead
+HOLD_TICK_MS = 50
+# Hold moves in flight at once. With feed hold the release halts the tail, so
+# the next move can already wait in the controller and the head never stops
+# between ticks; without it every queued move would still run after the release.
+HOLD_QUEUE = 2
+# mm/s while a button is held, per step size on the slider
+HOLD_SPEEDS = {0.1: 2.0, 1: 10.0, 10: 40.0, 100: 80.0}
+
+ATTRIBUTES = {"X": "XCoOrdinate", "Y": "YCoOrdinate", "Z": "ZCoOrdinate"}
+
+
+class JogController(QObject):
+    """Turns jog button taps and holds into as few moves as possible for the backend."""
+
+    def __init__(self, backend, parent=None):
+        super().__init__(parent)
+        self.backend = backend
+        self.limits = {}
+        self.limits_mtime = None
+        self.screen = None
+        self.edits = {}  # axis -> QLineEdit showing it
+        self.pending = set()  # axes changed since the last move went out
+
+        self.coalesce_timer = QTimer(self)
+        self.coalesce_timer.setSingleShot(True)
+        self.coalesce_timer.timeout.connect(self._flush)
+
+        self.hold_timer = QTimer(self)
+        self.hold_timer.setSingleShot(True)
+        self.hold_timer.timeout.connect(self._start_hold)
+        self.tick_timer = QTimer(self)
+        self.tick_timer.timeout.connect(self._hold_tick)
+        self.hold = None  # (axis, direction) while streaming
+        self.pressed = None
+        self.swallow_click = False
+        self.outstanding = 0  # hold moves sent and not finished yet
+        self.halting = False  # release halted the hold, waiting for the abort report
+        self.reached = {}  # hold axis -> last target the controller acknowledged
+        self.backend.aborted.connect(self._aborted)
+
+    def _limit(self, axis):
+        # (min, max) from start_up_values.json, re-read only after a recalibration
+        try:
+            mtime = os.path.getmtime(LIMITS_FILE)
+            if mtime != self.limits_mtime:
+                with open(LIMITS_FILE, "r") as f:
+                    self.limits = json.load(f)
+                self.limits_mtime = mtime
+        except (OSError, ValueError) as e:
+            print(f"[Jog] Limits not read: {e}")
+        return self.limits.get(f"OFFSETS_{axis}", 0), self.limits.get(f"MAX_TRAVELS_{axis}", 400)
+
+    def _move_to(self, axis, value):
+        low, high = self._limit(axis)
+        value = round(min(max(value, low), high), 2)
+        setattr(self.screen, ATTRIBUTES[axis], value)
+        self.edits[axis].setText(str(value))
+        return value
+
+    def _targets(self, axes):
+        return {axis: getattr(self.screen, ATTRIBUTES[axis]) for axis in axes}
+
+# ============================ Taps ==================================
+    def tap(self, axis, direction, obj, edit):
+        # The screen shows the new target at once, the move leaves once the taps stop
+        if self.swallow_click:
+            self.swallow_click = False  # release of a hold, it already moved
+            return
+        self.screen = obj
+        self.edits[axis] = edit
+        self._move_to(axis, getattr(obj, ATTRIBUTES[axis]) + direction * obj.stepSize)
+        self.pending.add(axis)
+        self.coalesce_timer.start(COALESCE_MS)
+
+    def _flush(self):
+        if self.pending:
+            self.backend.jog(self._targets(self.pending))
+            self.pending.clear()
+
+# ============================ Hold ==================================
+    def press(self, axis, direction, obj, edit):
+        self.screen = obj
+        self.edits[axis] = edit
+        self.pressed = (axis, direction)
+        self.swallow_click = False
+        self.hold_timer.start(HOLD_DELAY_MS)
+
+    def _start_hold(self):
+        self._flush()
+        self.hold = self.pressed
+        self.swallow_click = True
+        axis = self.hold[0]
+        self.reached = {axis: getattr(self.screen, ATTRIBUTES[axis])}
+        self.tick_timer.start(HOLD_TICK_MS)
+
+    def _feed_hold(self):
+        return bool(self.backend.state.get("feed_hold"))
+
+    def _hold_tick(self):
+        # Each tick sends the next target while fewer than HOLD_QUEUE moves are
+        # in flight (one without feed hold: the head then stops within one tick
+        # of the release, at the cost of a short stop between moves)
+        if self.outstanding >= (HOLD_QUEUE if self._feed_hold() else 1):
+            return
+        axis, direction = self.hold
+        speed = HOLD_SPEEDS.get(self.screen.stepSize, 10.0)
+        current = getattr(self.screen, ATTRIBUTES[axis])
+        target = self._move_to(axis, current + direction * speed * HOLD_TICK_MS / 1000)
+        if target != current:
+            self.outstanding += 1
+            self.backend.jog({axis: target}, on_result=lambda ok, value: self._hold_sent(ok, value, axis, target))
+
+    def _hold_sent(self, ok, value, axis, target):
+        if not ok or not isinstance(value, dict) or "batch" not in value:
+            self.outstanding -= 1
+            self._sync_position()
+            return
+        self.backend.on_batch_done(value["batch"], lambda info: self._hold_done(info, axis, target))
+
+    def _hold_done(self, info, axis, target):
+        self.outstanding -= 1
+        if info["status"] == "ok":
+            self.reached[axis] = target
+        if self.hold is None:
+            # Released: the last move to end shows where the head stopped,
+            # unless the halt's abort report is on its way with that
+            if not self.outstanding and not self.halting:
+                self._sync_position()
+        elif info["status"] not in ("ok", "cancelled"):
+            # Cancelled is a queued move replaced by the next tick's
+            self._sync_position()
+
+    def release(self):
+        self.hold_timer.stop()
+        self.pressed = None
+        if self.hold is None:
+            return
+        self.tick_timer.stop()
+        self.hold = None
+        if self.outstanding and self._feed_hold():
+            # Halt the moves in flight, the abort report says where the head stopped
+            self.halting = True
+            self.backend.stop_jog(on_result=self._jog_stopped)
+            return
+        # Drop anything not sent yet; the move in flight (if any) syncs when it ends
+        self.backend.cancel_jog()
+        if not self.outstanding:
+            self._sync_position()
+
+    def _jog_stopped(self, ok, halted):
+        if ok and halted:
+            return
+        # No halt (the moves had already ended): they sync as usual
+        self.halting = False
+        if not self.outstanding:
+            self._sync_position()
+
+    def _aborted(self, report):
+        if not self.halting:
+            return
+        self.halting = False
+        position = report.get("position") or {}
+        for axis in self.reached:
+            if position.get(axis) is not None:
+                self.reached[axis] = position[axis]
+        if self.hold is None:
+            self._sync_position()
+
+    def _sync_position(self):
+        # Show where the controller acknowledged the head, not the last target typed in
+        if self.screen is None:
+            return
+        for axis, value in self.reached.items():
+            if axis in self.edits:
+                setattr(self.screen, ATTRIBUTES[axis], round(value, 2))
+                self.edits[axis].setText(str(round(value, 2)))
@@ -3,8 +3,13 @@ import os
 from .utils import Utils
 from PyQt5.QtWidgets import QMessageBox,QApplication
 from PyQt5.QtWidgets import QLabel
-from .Machine_Code.Machine_Backend_V2 import LHSFunction
-Liquid_handling = LHSFunction()
+from .Machine_Code.backend_process import BackendProcess
+from .jog_controller import JogController
+# Serial / camera backend runs in its own process, the screen never waits on it.
+# main.py starts it right after the QApplication; start() here is a no-op then.
+Liquid_handling = BackendProcess()
+Liquid_handling.start()
+jogger = JogController(Liquid_handling)
 utils = Utils()
 
 class Triggers:
@@ -12,73 +17,45 @@ class Triggers:
         if not Liquid_handling.home_done:
                 utils.warning(obj,"Press Home First...")
         else:
-            file_path = "calibration/Machine_Code/start_up_values.json"
-            if os.path.exists(file_path):
-                with open(file_path, "r") as f:
-                    data = json.load(f)
-            obj.YCoOrdinate = max((round((obj.YCoOrdinate - obj.stepSize) , 2)), data["OFFSETS_Y"])
-            edit.setText(str(obj.YCoOrdinate))
-            Liquid_handling.enqueue_commands([f'G0Y{obj.YCoOrdinate};'])
+            jogger.tap("Y", -1, obj, edit)
     
     def btn_y_down(obj,edit):
         if not Liquid_handling.home_done:
                 utils.warning(obj,"Press Home First...")
         else:
-            file_path = "calibration/Machine_Code/start_up_values.json"
-            if os.path.exists(file_path):
-                with open(file_path, "r") as f:
-                    data = json.load(f)
-            obj.YCoOrdinate = min((round((obj.YCoOrdinate + obj.stepSize) , 2)), data["MAX_TRAVELS_Y"])
-            edit.setText(str(obj.YCoOrdinate))
-            Liquid_handling.enqueue_commands([f'G0Y{obj.YCoOrdinate};'])
+            jogger.tap("Y", 1, obj, edit)
 
     def btn_x_left(obj,edit):
         if not Liquid_handling.home_done:
                 utils.warning(obj,"Press Home First...")
         else:
-            file_path = "calibration/Machine_Code/start_up_values.json"
-            if os.path.exists(file_path):
-                with open(file_path, "r") as f:
-                    data = json.load(f)
-            obj.XCoOrdinate = max((round((obj.XCoOrdinate - obj.stepSize) , 2)), data["OFFSETS_X"])
-            edit.setText(str(obj.XCoOrdinate))
-            Liquid_handling.enqueue_commands([f'G0X{obj.XCoOrdinate};'])
+            jogger.tap("X", -1, obj, edit)
 
     def btn_x_right(obj,edit):
         if not Liquid_handling.home_done:
                 utils.warning(obj,"Press Home First...")
         else:
-            file_path = "calibration/Machine_Code/start_up_values.json"
-            if os.path.exists(file_path):
-                with open(file_path, "r") as f:
-                    data = json.load(f)
-            obj.XCoOrdinate = min((round((obj.XCoOrdinate + obj.stepSize) , 2)), data["MAX_TRAVELS_X"])
-            edit.setText(str(obj.XCoOrdinate))
-            Liquid_handling.enqueue_commands([f'G0X{obj.XCoOrdinate};'])
+            jogger.tap("X", 1, obj, edit)
 
     def btn_z_up(obj,edit):
         if not Liquid_handling.home_done:
                 utils.warning(obj,"Press Home First...")
         else:
-            file_path = "calibration/Machine_Code/start_up_values.json"
-            if os.path.exists(file_path):
-                with open(file_path, "r") as f:
-                    data = json.load(f)
-            obj.ZCoOrdinate = max((round((obj.ZCoOrdinate - obj.stepSize) , 2)), data["OFFSETS_Z"])
-            edit.setText(str(obj.ZCoOrdinate))
-            Liquid_handling.enqueue_commands([f'G0Z{obj.ZCoOrdinate};'])
+            jogger.tap("Z", -1, obj, edit)
 
     def btn_z_down(obj,edit):
         if not Liquid_handling.home_done:
                 utils.warning(obj,"Press Home First...")
         else:
-            file_path = "calibration/Machine_Code/start_up_values.json"
-            if os.path.exists(file_path):
-                with open(file_path, "r") as f:
-                    data = json.load(f)
-            obj.ZCoOrdinate = min((round((obj.ZCoOrdinate + obj.stepSize) , 2)), data["MAX_TRAVELS_Z"])
-            edit.setText(str(obj.ZCoOrdinate))
-            Liquid_handling.enqueue_commands([f'G0Z{obj.ZCoOrdinate};'])
+            jogger.tap("Z", 1, obj, edit)
+
+    # Press and hold: streams the axis until released (the click that follows is ignored)
+    def btn_jog_pressed(obj,edit,axis,direction):
+        if Liquid_handling.home_done:
+            jogger.press(axis, direction, obj, edit)
+
+    def btn_jog_released():
+        jogger.release()
 
     def x_label_edit(obj,text,edit):
         try:
@@ -138,23 +115,11 @@ class Triggers:
             print("Wrong Input Detected")
             obj.setText(str(obj.ZCoOrdinate))
     
+    # DLD / STRE / STE procedures are commented out in the backend, their buttons are disabled
+    UNAVAILABLE = ("DLD", "STRE", "STE")
+
     def functionality_buttons(name,self):
-        if name=='DLD':
-            if not Liquid_handling.home_done:
-                utils.warning(self,"Press Home First...")
-            else:
-                Liquid_handling.Diagonal_Liquid_Drop()
-        elif name=='STRE':
-            if not Liquid_handling.home_done:
-                utils.warning(self,"Press Home First...")
-            else:
-                Liquid_handling.Single_Tip_row_Ejection()
-        elif name=='STE':
-            if not Liquid_handling.home_done:
-                utils.warning(self,"Press Home First...")
-            else:
-                Liquid_handling.Single_Tip_Ejection()
-        elif name=='START':
+        if name=='START':
             if not Liquid_handling.home_done:
                 utils.warning(self,"Press Home First...")
             else:    
@@ -225,7 +190,7 @@ class Triggers:
             
         elif name=='HOME':
             if not Liquid_handling.IsStartupSend:
-               utils.warning(self,"Wait For Startup...")
+               utils.warning(self,f"Wait For Startup... ({Liquid_handling.startup_status()})")
             else:
                 Liquid_handling.home_clicked()
         
@@ -239,4 +204,45 @@ class Triggers:
                utils.warning(self,"Wait For Startup...")
             else:
                 print("btn2 clicked")
-        
\ No newline at end of file
+
+    # Deck monitor paused the run: one prompt at a time, later changes update it
+    deck_prompt = None
+
+    def deck_changed(status, missing, paused):
+        if not paused:
+            print(f"[Monitor] Deck changed, missing: {missing}")
+            return
+        if status == 5:
+            text = "All boxes are back on the deck.\nResume the run or abort it?"
+        else:
+            text = f"Deck changed, missing: {', '.join(missing)}\nThe run is paused. Resume or abort it?"
+        if Triggers.deck_prompt is not None:
+            Triggers.deck_prompt.setText(text)
+            return
+
+        msg_box = QMessageBox(QApplication.activeWindow())
+        msg_box.setIcon(QMessageBox.Warning)
+        msg_box.setWindowTitle("Run Paused")
+        msg_box.setText(text)
+        resume_btn = msg_box.addButton("Resume", QMessageBox.AcceptRole)
+        abort_btn = msg_box.addButton("Abort", QMessageBox.RejectRole)
+        msg_box.setStyleSheet("QMessageBox, QLabel { background-color: #23272e; color: white; font-size: 18px; font-weight: bold; }")
+        resume_btn.setStyleSheet("background-color: #5e81ac; color: white; border: 1px solid #81a1c1; border-radius: 6px; font-size: 15px; padding: 8px 24px; margin: 8px 4px;")
+        abort_btn.setStyleSheet("background-color: #3b4252; color: white; border: 1px solid #81a1c1; border-radius: 6px; font-size: 15px; padding: 8px 24px; margin: 8px 4px;")
+
+        def answered(_):
+            Triggers.deck_prompt = None
+            if msg_box.clickedButton() is resume_btn:
+                print("User chose Resume")
+                Liquid_handling.resume_run()
+            else:
+                print("User chose Abort")
+                Liquid_handling.stop_clicked()
+
+        # Not exec_(): a nested event loop would deliver the next deck event into this one
+        msg_box.finished.connect(answered)
+        Triggers.deck_prompt = msg_box
+        msg_box.open()
+
+
+Liquid_handling.deck_changed.connect(Triggers.deck_changed)
@@ -8,6 +8,9 @@ from utilities.utils import Utils
 
 # application initialization
 app = QApplication(sys.argv)
+# Hardware backend process: started now so it is connecting while the splash shows
+from calibration.triggers import Liquid_handling
+Liquid_handling.start()
 FontManager.load_fonts()
 main_window = MainWindow()
 ss = Utils.load_stylesheet("globals.qss")